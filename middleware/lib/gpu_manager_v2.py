@@ -30,7 +30,7 @@ from typing import Optional, Dict, List
 from contextlib import asynccontextmanager
 from loguru import logger
 
-from .vram_tracker import VRAMTracker, VRAMStatus, get_vram_tracker
+from .vram_tracker import VRAMTracker, VRAMStatus, get_vram_tracker, NVML_EXECUTOR
 from .lifecycle_manager import LifecycleManager, get_lifecycle_manager
 from .service_registry import (
     ServiceConfig, ServiceState, DEFAULT_SERVICES, get_services_for_phase
@@ -68,16 +68,23 @@ class GPUManagerV2:
         self.vram = get_vram_tracker()
         self.lifecycle = get_lifecycle_manager()
         self.services = services or DEFAULT_SERVICES
+        # Fixed at construction; endpoints check names against it per request
+        self.service_names = frozenset(self.services)
 
     # === VRAM Management ===
 
-    def get_vram_status(self) -> VRAMStatus:
-        """Get real-time VRAM status."""
-        return self.vram.get_status()
+    def get_vram_status(self, include_processes: bool = True) -> VRAMStatus:
+        """Get real-time VRAM status (processes only if include_processes)."""
+        return self.vram.get_status(include_processes=include_processes)
+
+    async def get_vram_status_async(self, include_processes: bool = True) -> VRAMStatus:
+        """get_vram_status() without blocking the event loop on NVML."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(NVML_EXECUTOR, self.get_vram_status, include_processes)
 
     def get_available_vram(self) -> int:
         """Get available VRAM in MB (after reserve)."""
-        status = self.get_vram_status()
+        status = self.get_vram_status(include_processes=False)
         return max(0, status.free_mb - self.VRAM_RESERVE_MB)
 
     def can_start_service(self, service_name: str) -> bool:
@@ -267,7 +274,7 @@ class GPUManagerV2:
         Returns:
             Dict with vram, services, and lock information
         """
-        vram = self.get_vram_status()
+        vram = await self.get_vram_status_async()
         states = await self.lifecycle.get_all_states()
 
         return {
@@ -275,7 +282,7 @@ class GPUManagerV2:
                 "total_mb": vram.total_mb,
                 "used_mb": vram.used_mb,
                 "free_mb": vram.free_mb,
-                "available_mb": self.get_available_vram(),
+                "available_mb": max(0, vram.free_mb - self.VRAM_RESERVE_MB),
                 "processes": [
                     {"pid": p.pid, "name": p.name, "memory_mb": p.memory_mb}
                     for p in vram.processes
@@ -15,12 +15,16 @@ Architecture based on Deep Think consensus:
 """
 
 import os
+import re
+import asyncio
 import logging
 import hashlib
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass
 
+import orjson
+
 from lib.sanity_client import get_sanity_client
 from lib.ir_normalizer import get_ir_normalizer, UniversalContextSchema
 from lib.intent_router import get_intent_router
@@ -28,6 +32,80 @@ from lib.doc_grader import get_doc_grader
 
 logger = logging.getLogger("PerceptionPipeline")
 
+# GROQ queries (hoisted so every call reuses the same query string)
+Q_TOPIC_BY_FP = '*[_type == "topic" && fingerprint == $fp][0]'
+Q_TOPIC_BY_ID = '*[_type == "topic" && _id == $id][0]'
+Q_ARTISTS_BY_IDS = '*[_type == "artist" && _id in $ids]'
+Q_NICHE_BY_ID = '*[_type == "nicheConfig" && _id == $id][0]'
+
+# Titles shorter than this (with no content) are too weak for embedding match
+MIN_SEMANTIC_TITLE_LEN = 12
+
+# orjson-encoded request bodies need an explicit content type
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# JSON object inside an optional ```json fence in LLM output
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+class DataLoader:
+    """
+    Coalesce concurrent single-key lookups into one batched fetch.
+    
+    Keys requested within `wait_ms` of each other (up to `max_batch` distinct
+    keys) are resolved by a single `batch_fn(keys) -> {key: value}` call.
+    Missing keys resolve to None.
+    """
+    
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str]], Dict[str, Any]],
+        max_batch: int = 25,
+        wait_ms: int = 5
+    ):
+        self._batch_fn = batch_fn
+        self._max_batch = max_batch
+        self._wait_s = wait_ms / 1000
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+    
+    async def load(self, key: str) -> Any:
+        """Queue a key for the next batch and wait for its value."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        
+        if len(self._pending) >= self._max_batch:
+            self._dispatch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._wait_s, self._dispatch)
+        
+        return await future
+    
+    def _dispatch(self):
+        """Resolve all pending keys with one batch call."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        
+        try:
+            results = self._batch_fn(list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        
+        for key, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(key))
+
 
 @dataclass
 class TopicSignal:
@@ -37,6 +115,10 @@ class TopicSignal:
     content_snippet: str
     metrics: Dict[str, Any]  # likes, comments, shares
     
+    def __post_init__(self):
+        # Enforce the 500-char snippet limit once, at construction
+        self.content_snippet = (self.content_snippet or "")[:500]
+    
     def to_sanity(self) -> Dict:
         """Convert to Sanity object format."""
         import uuid
@@ -44,7 +126,7 @@ class TopicSignal:
             "_key": str(uuid.uuid4())[:8],
             "platform": self.platform,
             "url": self.url,
-            "content_snippet": self.content_snippet[:500] if self.content_snippet else "",
+            "content_snippet": self.content_snippet,
             "metrics": {
                 "likes": self.metrics.get("likes", 0),
                 "comments": self.metrics.get("comments", 0),
@@ -67,6 +149,10 @@ class TopicSuggestion:
     extracted_hooks: List[str] = None
     niche_id: Optional[str] = None
     
+    def __post_init__(self):
+        # Drop repeated keywords but keep the crawler's order for Sanity
+        self.keywords = list(dict.fromkeys(self.keywords or []))
+    
     def compute_fingerprint(self) -> str:
         """Generate deduplication fingerprint from title + keywords."""
         content = f"{self.title}|{'|'.join(sorted(self.keywords))}"
@@ -86,10 +172,16 @@ class PerceptionPipeline:
         self.sanity = get_sanity_client()
         self._insight_engine = None  # Lazy load
         
+        # Collapses concurrent artist lookups into one `_id in $ids` query
+        self._artist_loader = DataLoader(self._batch_fetch_artists, max_batch=25, wait_ms=5)
+        
         # URLs for external services
         self.mediacrawler_url = os.getenv("CRAWLER_URL", "http://mediacrawler:8001")
         self.rsshub_url = os.getenv("RSSHUB_URL", "http://rsshub:1200")
         self.open_notebook_url = os.getenv("OPEN_NOTEBOOK_URL", "http://open-notebook:5055")
+        self.antigravity_url = os.getenv("ANTIGRAVITY_BASE_URL", "http://127.0.0.1:8045/v1")
+        
+        self._llm_http = None  # Pooled httpx.AsyncClient for Antigravity (lazy)
         
         logger.info("PerceptionPipeline initialized")
     
@@ -101,6 +193,29 @@ class PerceptionPipeline:
             self._insight_engine = get_insight_engine()
         return self._insight_engine
     
+    @property
+    def llm_http(self):
+        """Lazy-load a keep-alive HTTP client for Antigravity LLM calls."""
+        if self._llm_http is None:
+            import httpx
+            self._llm_http = httpx.AsyncClient(
+                base_url=self.antigravity_url,
+                timeout=120.0,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            )
+        return self._llm_http
+    
+    async def aclose(self):
+        """Close the pooled HTTP client."""
+        if self._llm_http is not None:
+            await self._llm_http.aclose()
+            self._llm_http = None
+    
+    def _batch_fetch_artists(self, artist_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch several artists in one GROQ query, keyed by _id."""
+        artists = self.sanity.query(Q_ARTISTS_BY_IDS, {"ids": artist_ids}) or []
+        return {a["_id"]: a for a in artists}
+    
     # =========================================================================
     # Main Ingestion API
     # =========================================================================
@@ -178,11 +293,12 @@ class PerceptionPipeline:
         
         Two-stage deduplication:
         1. Exact fingerprint match (fast, hash-based)
-        2. Semantic similarity via Qdrant (if fingerprint not found)
+        2. Semantic similarity via Qdrant (if fingerprint not found and
+           the signal carries enough text for a meaningful embedding)
         """
         # Stage 1: Exact fingerprint match
         result = self.sanity.query(
-            '*[_type == "topic" && fingerprint == $fp][0]',
+            Q_TOPIC_BY_FP,
             {"fp": fingerprint}
         )
         
@@ -190,6 +306,10 @@ class PerceptionPipeline:
             logger.info(f"Found exact fingerprint match: {result.get('_id')}")
             return result
         
+        # Skip stage 2 for low-information signals (unreliable similarity)
+        if len(title) < MIN_SEMANTIC_TITLE_LEN and not content:
+            return None
+        
         # Stage 2: Semantic similarity via Qdrant
         try:
             from lib.qdrant_client import get_qdrant_client
@@ -210,7 +330,7 @@ class PerceptionPipeline:
                 
                 # Fetch full topic from Sanity
                 return self.sanity.query(
-                    '*[_type == "topic" && _id == $id][0]',
+                    Q_TOPIC_BY_ID,
                     {"id": best_match["topic_id"]}
                 )
                 
@@ -274,13 +394,17 @@ class PerceptionPipeline:
             
             qdrant = get_qdrant_client()
             content = topic.signals[0].content_snippet if topic.signals else ""
-            await qdrant.upsert_topic(
+            stored = await qdrant.upsert_topic(
                 topic_id=topic_id,
                 title=topic.title,
                 content=content,
-                source_type=topic.source_type
+                source_type=topic.source_type,
+                wait=True  # Searchable before the next signal is deduplicated
             )
-            logger.info(f"✅ Stored embedding for topic: {topic_id}")
+            if stored:
+                logger.info(f"✅ Stored embedding for topic: {topic_id}")
+            else:
+                logger.warning(f"Embedding not stored for topic: {topic_id}")
         except Exception as e:
             logger.warning(f"Failed to store embedding in Qdrant: {e}")
         
@@ -315,7 +439,7 @@ class PerceptionPipeline:
         
         # 1. Get niche config
         niche = self.sanity.query(
-            '*[_type == "nicheConfig" && _id == $id][0]',
+            Q_NICHE_BY_ID,
             {"id": niche_id}
         )
         
@@ -352,7 +476,7 @@ class PerceptionPipeline:
                             errors.append(f"{platform}/{keyword}: HTTP {response.status_code}")
                             continue
                         
-                        crawl_result = response.json()
+                        crawl_result = orjson.loads(response.content)
                         
                     if not crawl_result.get("success"):
                         continue
@@ -521,12 +645,13 @@ class PerceptionPipeline:
                 "success": True,
                 "topic_id": "...",
                 "ucs": {...},  # UniversalContextSchema
+                "topic": {...},  # Topic document as fetched from Sanity
                 "research_agent": "bettafish"
             }
         """
         # 1. Get topic from Sanity
         topic = self.sanity.query(
-            '*[_type == "topic" && _id == $id][0]',
+            Q_TOPIC_BY_ID,
             {"id": topic_id}
         )
         
@@ -577,6 +702,7 @@ class PerceptionPipeline:
             "success": True,
             "topic_id": topic_id,
             "ucs": ucs,
+            "topic": topic,
             "research_agent": research_agent
         }
     
@@ -693,11 +819,8 @@ class PerceptionPipeline:
         # Get artist's notebook ID (if assigned)
         artist_ref = topic.get("assigned_artist", {})
         if artist_ref and artist_ref.get("_ref"):
-            artist = self.sanity.query(
-                '*[_type == "artist" && _id == $id][0]',
-                {"id": artist_ref["_ref"]}
-            )
-            notebook_id = artist.get("knowledgeBase", {}).get("notebookId")
+            artist = await self._artist_loader.load(artist_ref["_ref"])
+            notebook_id = (artist or {}).get("knowledgeBase", {}).get("notebookId")
         else:
             notebook_id = None
         
@@ -758,11 +881,8 @@ class PerceptionPipeline:
         
         ucs = enrichment.get("ucs")
         
-        # 2. Get artist context
-        topic = self.sanity.query(
-            '*[_type == "topic" && _id == $id][0]',
-            {"id": topic_id}
-        )
+        # 2. Get artist context (topic was already fetched during enrichment)
+        topic = enrichment["topic"]
         
         if artist_id:
             artist_ref = artist_id
@@ -771,10 +891,7 @@ class PerceptionPipeline:
         
         artist = None
         if artist_ref:
-            artist = self.sanity.query(
-                '*[_type == "artist" && _id == $id][0]',
-                {"id": artist_ref}
-            )
+            artist = await self._artist_loader.load(artist_ref)
         
         # 3. Generate script with Gemini using UCS
         script = await self._generate_script_with_gemini(ucs, artist, topic)
@@ -805,10 +922,6 @@ class PerceptionPipeline:
         The UCS provides a consistent format regardless of which
         research agent was used (BettaFish, MiroThinker, OpenNotebook).
         """
-        import httpx
-        import json
-        import re
-        
         # Build artist persona context
         persona = ""
         if artist:
@@ -858,30 +971,28 @@ class PerceptionPipeline:
 """
         
         try:
-            antigravity_url = os.getenv("ANTIGRAVITY_BASE_URL", "http://127.0.0.1:8045/v1")
-            
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    f"{antigravity_url}/chat/completions",
-                    json={
-                        "model": "gemini-2.0-flash",
-                        "messages": [
-                            {"role": "system", "content": "你是专业的短视频编剧，擅长创作病毒式传播的内容。只返回JSON，不要其他解释。"},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7
-                    }
-                )
-                result = response.json()
+            response = await self.llm_http.post(
+                "/chat/completions",
+                content=orjson.dumps({
+                    "model": "gemini-2.0-flash",
+                    "messages": [
+                        {"role": "system", "content": "你是专业的短视频编剧，擅长创作病毒式传播的内容。只返回JSON，不要其他解释。"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": 0.7
+                }),
+                headers=_JSON_HEADERS
+            )
+            result = orjson.loads(response.content)
             
             content = result.get("choices", [{}])[0].get("message", {}).get("content", "{}")
             
             # Extract JSON from markdown if present
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
+            json_match = _JSON_FENCE_RE.search(content)
             if json_match:
                 content = json_match.group(1)
             
-            script = json.loads(content)
+            script = orjson.loads(content)
             script["success"] = True
             return script
             
@@ -903,3 +1014,9 @@ def get_perception_pipeline() -> PerceptionPipeline:
     if _pipeline is None:
         _pipeline = PerceptionPipeline()
     return _pipeline
+
+
+async def close_perception_pipeline():
+    """Release pooled connections held by the singleton (app shutdown)."""
+    if _pipeline is not None:
+        await _pipeline.aclose()
@@ -28,9 +28,20 @@ Usage:
 import logging
 import sys
 import os
+import json
+import hashlib
+import functools
+import inspect
+import operator
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from lib import redis_client
+
 logger = logging.getLogger("QueryEngine")
 
 # Add BettaFish to path
@@ -38,6 +49,117 @@ BETTAFISH_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '../../external/BettaFish')
 )
 
+CACHE_KEY_PREFIX = "qe:"
+
+# Pull all fields of a Tavily result/image in one C-level call
+_RESULT_FIELDS = operator.attrgetter("title", "url", "content", "score", "published_date")
+_IMAGE_FIELDS = operator.attrgetter("url", "description")
+
+_bootstrap_done = False
+
+
+def _bootstrap_bettafish():
+    """Load BettaFish .env and put it on sys.path (once per process)."""
+    global _bootstrap_done
+    if _bootstrap_done:
+        return
+    
+    from dotenv import load_dotenv
+    bettafish_env = os.path.join(BETTAFISH_PATH, '.env')
+    if os.path.exists(bettafish_env):
+        load_dotenv(bettafish_env)
+        logger.info(f"Loaded BettaFish config from {bettafish_env}")
+    
+    if BETTAFISH_PATH not in sys.path:
+        sys.path.insert(0, BETTAFISH_PATH)
+    _bootstrap_done = True
+
+
+# Single-flight registry: cache key -> Future of the call in progress
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+INFLIGHT_WAIT = 120  # seconds a duplicate caller waits before calling directly
+
+# Shared pool for independent Tavily calls (reused across topics)
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tavily")
+
+
+def tavily_cached(ttl: int):
+    """
+    Cache a search method's result dict in Redis for `ttl` seconds.
+    
+    The key is a hash of (method, bound arguments with defaults applied),
+    so search(q, 5) and search(q, max_results=5) share one entry.
+    Concurrent callers with the same key share one in-flight call instead
+    of each hitting Tavily. Error responses are not cached, and Redis
+    failures fall through to the live call. Callers can bypass the cache
+    with use_cache=False.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        
+        @functools.wraps(fn)
+        def wrapper(self, *args, use_cache: bool = True, **kwargs):
+            if not use_cache:
+                return fn(self, *args, **kwargs)
+            
+            try:
+                bound = signature.bind(self, *args, **kwargs)
+            except TypeError:
+                return fn(self, *args, **kwargs)  # Let fn raise its own error
+            bound.apply_defaults()
+            bound.arguments.pop('self', None)
+            params = json.dumps(bound.arguments, sort_keys=True, ensure_ascii=False)
+            key = CACHE_KEY_PREFIX + hashlib.blake2b(
+                f"{fn.__name__}|{params}".encode()
+            ).hexdigest()
+            
+            with _inflight_lock:
+                future = _inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = _inflight[key] = Future()
+            
+            if not owner:
+                try:
+                    return future.result(timeout=INFLIGHT_WAIT)
+                except FutureTimeout:
+                    logger.warning(f"{fn.__name__} in-flight wait timed out; calling directly")
+                    return fn(self, *args, **kwargs)
+            
+            try:
+                result = _cached_call(fn, self, args, kwargs, key, ttl)
+                future.set_result(result)
+                return result
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with _inflight_lock:
+                    _inflight.pop(key, None)
+        return wrapper
+    return decorator
+
+
+def _cached_call(fn, self, args, kwargs, key: str, ttl: int) -> Dict:
+    """Serve from Redis, or call fn and store a successful result."""
+    try:
+        cached = redis_client.r.get(key)
+        if cached:
+            logger.debug(f"{fn.__name__} cache hit")
+            return redis_client.unpack_payload(cached)
+    except Exception as e:
+        logger.warning(f"QueryEngine cache read failed: {e}")
+    
+    result = fn(self, *args, **kwargs)
+    
+    if "error" not in result:
+        try:
+            redis_client.r.setex(key, ttl, redis_client.pack_payload(result))
+        except Exception as e:
+            logger.warning(f"QueryEngine cache write failed: {e}")
+    return result
+
 
 class QueryEngineWrapper:
     """
@@ -50,59 +172,60 @@ class QueryEngineWrapper:
     - Deep news analysis
     """
     
+    # In-process memo for get_context_for_topic: key -> (stored_at, result dict)
+    CONTEXT_CACHE_SIZE = 512
+    CONTEXT_CACHE_TTL = 300  # seconds
+    _context_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+    _context_cache_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize QueryEngine wrapper."""
         self._tavily_client = None
+        self._tavily_lock = threading.Lock()
         logger.info("QueryEngineWrapper initialized")
     
     def _get_tavily_client(self):
-        """Lazy load Tavily client."""
-        if self._tavily_client is None:
-            # Load BettaFish .env
-            from dotenv import load_dotenv
-            bettafish_env = os.path.join(BETTAFISH_PATH, '.env')
-            if os.path.exists(bettafish_env):
-                load_dotenv(bettafish_env)
-                logger.info(f"Loaded BettaFish config from {bettafish_env}")
-            
-            if BETTAFISH_PATH not in sys.path:
-                sys.path.insert(0, BETTAFISH_PATH)
-            
-            try:
-                from QueryEngine.tools.search import TavilyNewsAgency
-                self._tavily_client = TavilyNewsAgency()
-                logger.info("TavilyNewsAgency loaded successfully")
-            except Exception as e:
-                logger.error(f"Failed to load TavilyNewsAgency: {e}")
-                raise
-        return self._tavily_client
+        """Lazy load Tavily client (thread-safe: searches may run in parallel)."""
+        with self._tavily_lock:
+            if self._tavily_client is None:
+                _bootstrap_bettafish()
+                
+                try:
+                    from QueryEngine.tools.search import TavilyNewsAgency
+                    # tavily-python's TavilyClient keeps its own keep-alive
+                    # requests.Session; the agency is built once and reused
+                    self._tavily_client = TavilyNewsAgency()
+                    logger.info("TavilyNewsAgency loaded successfully")
+                except Exception as e:
+                    logger.error(f"Failed to load TavilyNewsAgency: {e}")
+                    raise
+            return self._tavily_client
     
     def _response_to_dict(self, response) -> Dict:
         """Convert TavilyResponse to dict."""
+        results = [
+            {
+                "title": title,
+                "url": url,
+                "content": content[:500] if content else "",
+                "score": score,
+                "published_date": published_date
+            }
+            for title, url, content, score, published_date in map(_RESULT_FIELDS, response.results)
+        ]
         return {
             "query": response.query,
             "answer": response.answer,
-            "results": [
-                {
-                    "title": r.title,
-                    "url": r.url,
-                    "content": r.content[:500] if r.content else "",
-                    "score": r.score,
-                    "published_date": r.published_date
-                }
-                for r in response.results
-            ],
+            "results": results,
             "images": [
-                {
-                    "url": img.url,
-                    "description": img.description
-                }
-                for img in response.images
+                {"url": url, "description": description}
+                for url, description in map(_IMAGE_FIELDS, response.images)
             ],
             "response_time": response.response_time,
-            "result_count": len(response.results)
+            "result_count": len(results)
         }
     
+    @tavily_cached(ttl=600)  # 10 min
     def search_news(self, query: str, max_results: int = 7) -> Dict:
         """
         Basic news search.
@@ -124,6 +247,7 @@ class QueryEngineWrapper:
             logger.error(f"News search failed: {e}")
             return {"error": str(e), "results": [], "query": query}
     
+    @tavily_cached(ttl=86400)  # 24h
     def deep_search(self, query: str) -> Dict:
         """
         Deep news analysis with AI summary.
@@ -146,6 +270,7 @@ class QueryEngineWrapper:
             logger.error(f"Deep search failed: {e}")
             return {"error": str(e), "results": [], "query": query}
     
+    @tavily_cached(ttl=300)  # 5 min
     def search_last_24h(self, query: str) -> Dict:
         """
         Search news from the last 24 hours.
@@ -168,6 +293,7 @@ class QueryEngineWrapper:
             logger.error(f"24h search failed: {e}")
             return {"error": str(e), "results": [], "query": query}
     
+    @tavily_cached(ttl=3600)  # 1h
     def search_last_week(self, query: str) -> Dict:
         """
         Search news from the last week.
@@ -190,6 +316,7 @@ class QueryEngineWrapper:
             logger.error(f"Week search failed: {e}")
             return {"error": str(e), "results": [], "query": query}
     
+    @tavily_cached(ttl=86400)  # 24h
     def search_images(self, query: str) -> Dict:
         """
         Search for images related to a topic.
@@ -212,6 +339,7 @@ class QueryEngineWrapper:
             logger.error(f"Image search failed: {e}")
             return {"error": str(e), "images": [], "query": query}
     
+    @tavily_cached(ttl=86400)  # 24h
     def search_by_date_range(
         self, 
         query: str, 
@@ -239,6 +367,29 @@ class QueryEngineWrapper:
             logger.error(f"Date range search failed: {e}")
             return {"error": str(e), "results": [], "query": query}
     
+    def _memo_get(self, key: tuple) -> Optional[Dict]:
+        """Return a memoised search result if still fresh."""
+        with self._context_cache_lock:
+            entry = self._context_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.CONTEXT_CACHE_TTL:
+                del self._context_cache[key]
+                return None
+            self._context_cache.move_to_end(key)
+            return entry[1]
+    
+    def _memo_put(self, key: tuple, result: Dict) -> Dict:
+        """Memoise a successful search result (LRU-bounded)."""
+        if "error" in result:
+            return result
+        with self._context_cache_lock:
+            self._context_cache[key] = (time.monotonic(), result)
+            self._context_cache.move_to_end(key)
+            while len(self._context_cache) > self.CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        return result
+    
     def get_context_for_topic(self, topic_title: str) -> Dict:
         """
         Get comprehensive web context for a social media topic.
@@ -255,8 +406,24 @@ class QueryEngineWrapper:
         Returns:
             Dict with news context and images
         """
-        news = self.search_news(topic_title, max_results=5)
-        images = self.search_images(topic_title)
+        # Repeated topics in a batch reuse the converted dicts
+        news_key = ("news", topic_title, 5)
+        images_key = ("images", topic_title)
+        
+        news = self._memo_get(news_key)
+        images = self._memo_get(images_key)
+        
+        # News and image searches are independent HTTPS calls; run them together
+        news_future = images_future = None
+        if news is None:
+            news_future = _search_executor.submit(self.search_news, topic_title, 5)
+        if images is None:
+            images_future = _search_executor.submit(self.search_images, topic_title)
+        
+        if news_future:
+            news = self._memo_put(news_key, news_future.result())
+        if images_future:
+            images = self._memo_put(images_key, images_future.result())
         
         return {
             "topic": topic_title,
@@ -267,6 +434,7 @@ class QueryEngineWrapper:
             "has_context": news.get("result_count", 0) > 0
         }
     
+    # Not tavily_cached: a cache hit would skip save_report's file write
     def deep_research(self, query: str, save_report: bool = False) -> Dict:
         """
         Run full deep research with BettaFish QueryEngine's DeepSearchAgent.
@@ -294,13 +462,7 @@ class QueryEngineWrapper:
         """
         try:
             # Ensure BettaFish config is loaded
-            from dotenv import load_dotenv
-            bettafish_env = os.path.join(BETTAFISH_PATH, '.env')
-            if os.path.exists(bettafish_env):
-                load_dotenv(bettafish_env)
-            
-            if BETTAFISH_PATH not in sys.path:
-                sys.path.insert(0, BETTAFISH_PATH)
+            _bootstrap_bettafish()
             
             # Import and run the full DeepSearchAgent (QueryEngine version)
             from QueryEngine.agent import DeepSearchAgent
@@ -342,3 +504,21 @@ def get_query_engine() -> QueryEngineWrapper:
     if _engine is None:
         _engine = QueryEngineWrapper()
     return _engine
+
+
+def warmup() -> bool:
+    """
+    Import BettaFish and build the Tavily client ahead of the first query.
+    
+    Call at process start so no user request pays the cold import cost.
+    
+    Returns:
+        True if the Tavily client is ready
+    """
+    try:
+        get_query_engine()._get_tavily_client()
+        logger.info("QueryEngine warmed up")
+        return True
+    except Exception as e:
+        logger.warning(f"QueryEngine warmup failed (will retry on first query): {e}")
+        return False
@@ -1,66 +1,307 @@
 import redis
-import json
+import orjson
 import uuid
 import os
+import socket
+import time
 import logging
+import threading
 
 logger = logging.getLogger("RedisClient")
 
+try:
+    import zstandard
+    _ZSTD = zstandard.ZstdCompressor(level=3)
+    _ZSTD_D = zstandard.ZstdDecompressor()
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    logger.warning("zstandard not installed, Redis payloads stored uncompressed")
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESS_THRESHOLD = 1024  # bytes; smaller JSON is stored as-is
+
 # Connection
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 64))
+
+# Explicit pool shared by server threads / worker; hiredis (if installed)
+# is picked up automatically by redis-py for C-speed reply parsing.
+_pool = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_keepalive=True,
+    socket_keepalive_options={socket.TCP_KEEPIDLE: 60} if hasattr(socket, "TCP_KEEPIDLE") else None,
+    health_check_interval=30
+)
+r = redis.Redis(connection_pool=_pool)
+
+# Single priority queue: score = -priority * PRIORITY_SCALE + enqueue_ms,
+# so ZPOPMIN yields the highest priority first, oldest first within a tier.
+# VIP (100) / Normal (10) remain the conventional tiers.
+QUEUE_KEY = "gpu_queue"
+PRIORITY_SCALE = 1_000_000_000_000
+VIP_PRIORITY = 100
+POLL_INTERVAL = 0.2  # seconds between claim attempts while idle
+# Task info is a hash: "data" (immutable JSON doc) + status/result/error fields.
+# (Was a JSON string under "task:info:"; new prefix avoids WRONGTYPE on old keys.)
+KEY_PREFIX = "task:meta:"
+TASK_TTL = 86400  # 24h
+# Secondary indexes (sets of task ids) for dashboard queries via SINTER.
+# Members outlive expired tasks; find_tasks() prunes them lazily.
+STATUS_INDEX_PREFIX = "tasks:by_status:"
+TYPE_INDEX_PREFIX = "tasks:by_type:"
+
+# Reliable queue: claimed ids are moved to a per-worker processing list and
+# only removed by ack_task(); requeue_stale_tasks() returns orphans.
+# A worker is alive while its heartbeat key exists; start_heartbeat()
+# refreshes it from a background thread, so long renders keep their claims.
+PROCESSING_PREFIX = "gpu_queue:processing:"
+CLAIMS_KEY = "gpu_queue:claims"  # task_id -> "<queue score>|<claimed_at>"
+HEARTBEAT_PREFIX = "gpu_queue:heartbeat:"
+HEARTBEAT_INTERVAL = 10  # seconds between refreshes
+HEARTBEAT_TTL = int(os.getenv("WORKER_HEARTBEAT_TTL", 60))  # seconds
+# Must survive restarts so a restarted worker recovers its own list: the
+# container hostname (no pid). Set WORKER_ID when running several per host.
+WORKER_ID = os.getenv("WORKER_ID") or socket.gethostname()
+
+# Atomic status update in one round-trip. Fields are set individually, so
+# Lua never decodes the task JSON (cjson would mangle empty arrays and
+# round large ints such as seeds).
+# Also moves the id between status index sets (ARGV[5] = index prefix).
+UPDATE_SCRIPT = r.register_script("""
+local old = redis.call('HGET', KEYS[1], 'status')
+if not old then return 0 end
+redis.call('HSET', KEYS[1], 'status', ARGV[1])
+if ARGV[2] ~= '' then redis.call('HSET', KEYS[1], 'result', ARGV[2]) end
+if ARGV[3] ~= '' then redis.call('HSET', KEYS[1], 'error', ARGV[3]) end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+if old ~= ARGV[1] then
+    redis.call('SREM', ARGV[5] .. old, ARGV[6])
+    redis.call('SADD', ARGV[5] .. ARGV[1], ARGV[6])
+    redis.call('EXPIRE', ARGV[5] .. ARGV[1], ARGV[4])
+end
+return 1
+""")
+
+# Atomic ZPOPMIN + move into the processing list + record the claim.
+# (BZPOPMIN cannot move, so idle workers poll this every POLL_INTERVAL.)
+CLAIM_SCRIPT = r.register_script("""
+local t = redis.call('ZPOPMIN', KEYS[1])
+if #t == 0 then return false end
+redis.call('RPUSH', KEYS[2], t[1])
+redis.call('HSET', KEYS[3], t[1], t[2] .. '|' .. ARGV[1])
+return t[1]
+""")
+
+def pack_payload(obj):
+    """JSON-encode obj, zstd-compressing it above COMPRESS_THRESHOLD."""
+    data = orjson.dumps(obj)
+    if ZSTD_AVAILABLE and len(data) > COMPRESS_THRESHOLD:
+        return _ZSTD.compress(data)
+    return data
 
-QUEUE_VIP = "gpu_queue:vip"     # Priority 100
-QUEUE_NORMAL = "gpu_queue:normal" # Priority 10
-KEY_PREFIX = "task:info:"
+def unpack_payload(data):
+    """Inverse of pack_payload; accepts both compressed and raw JSON."""
+    if data[:4] == ZSTD_MAGIC:
+        data = _ZSTD_D.decompress(data)
+    return orjson.loads(data)
+
+def _queue_score(priority):
+    return -priority * PRIORITY_SCALE + int(time.time() * 1000)
 
 def enqueue_task(task_type, params, priority=1):
-    """Push task to appropriate queue."""
+    """Add task to the priority queue."""
     task_id = str(uuid.uuid4())
-    task_data = json.dumps({
+    task_data = pack_payload({
         "id": task_id,
         "type": task_type,
-        "params": params,
-        "status": "queued",
-        "result": None,
-        "error": None
+        "params": params
     })
     
-    # 1. Store Task Info (TTL 24h)
-    r.set(f"{KEY_PREFIX}{task_id}", task_data, ex=86400)
+    # Store Task Info (TTL 24h) + Queue it in one round-trip
+    key = f"{KEY_PREFIX}{task_id}"
+    with r.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping={"data": task_data, "status": "queued"})
+        pipe.expire(key, TASK_TTL)
+        pipe.zadd(QUEUE_KEY, {task_id: _queue_score(priority)})
+        for index in (f"{STATUS_INDEX_PREFIX}queued", f"{TYPE_INDEX_PREFIX}{task_type}"):
+            pipe.sadd(index, task_id)
+            pipe.expire(index, TASK_TTL)
+        pipe.execute()
 
-    # 2. Push to Queue
-    if priority >= 100:
-        r.rpush(QUEUE_VIP, task_id)
+    if priority >= VIP_PRIORITY:
         logger.info(f"🚀 [VIP] Task {task_id} added to Fast Lane")
     else:
-        r.rpush(QUEUE_NORMAL, task_id)
-        logger.info(f"🌊 [Normal] Task {task_id} added to Slow Lane")
+        logger.info(f"🌊 [Normal] Task {task_id} added to Slow Lane (priority {priority})")
         
     return task_id
 
-def get_next_task(timeout=5):
-    """Blocking Pop from Queues (VIP first)."""
-    # Keys are checked in order.
-    task = r.blpop([QUEUE_VIP, QUEUE_NORMAL], timeout=timeout)
+def get_next_task(timeout=5, worker_id=WORKER_ID):
+    """
+    Claim the highest-priority task into this worker's processing list.
+    
+    The id stays in the processing list until ack_task(), so a worker
+    crash mid-render leaves it recoverable instead of lost.
+    """
+    keys = [QUEUE_KEY, f"{PROCESSING_PREFIX}{worker_id}", CLAIMS_KEY]
+    deadline = time.monotonic() + timeout
+    
+    while True:
+        task_id = CLAIM_SCRIPT(keys=keys, args=[int(time.time())])
+        if task_id:
+            return task_id.decode('utf-8')
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(POLL_INTERVAL, remaining))
+
+def ack_task(task_id, worker_id=WORKER_ID):
+    """Drop a finished (completed or failed) task from the processing list."""
+    with r.pipeline(transaction=False) as pipe:
+        pipe.lrem(f"{PROCESSING_PREFIX}{worker_id}", 1, task_id)
+        pipe.hdel(CLAIMS_KEY, task_id)
+        pipe.execute()
+
+def _heartbeat_loop(worker_id, stop):
+    key = f"{HEARTBEAT_PREFIX}{worker_id}"
+    while not stop.is_set():
+        try:
+            r.set(key, int(time.time()), ex=HEARTBEAT_TTL)
+        except redis.RedisError as e:
+            logger.error(f"Heartbeat failed for {worker_id}: {e}")
+        stop.wait(HEARTBEAT_INTERVAL)
+
+def start_heartbeat(worker_id=WORKER_ID):
+    """
+    Keep this worker's heartbeat key alive from a daemon thread.
+    
+    Returns:
+        threading.Event that stops the heartbeat when set
+    """
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_loop, args=(worker_id, stop),
+        name=f"heartbeat-{worker_id}", daemon=True
+    ).start()
+    return stop
+
+def requeue_stale_tasks(worker_id=None):
+    """
+    Put orphaned tasks back in the queue at their original position.
+    
+    Args:
+        worker_id: If set, requeue everything held by this worker
+                   (used at worker startup, before its heartbeat starts).
+                   Otherwise requeue the lists of workers whose heartbeat
+                   has expired.
     
-    if task:
-        # task is (queue_name, value)
-        return task[1].decode('utf-8')
-    return None
+    Returns:
+        Number of tasks requeued
+    """
+    if worker_id is not None:
+        lists = [f"{PROCESSING_PREFIX}{worker_id}"]
+    else:
+        lists = r.scan_iter(match=f"{PROCESSING_PREFIX}*")
+    
+    requeued = 0
+    for processing in lists:
+        if isinstance(processing, bytes):
+            processing = processing.decode('utf-8')
+        owner = processing[len(PROCESSING_PREFIX):]
+        if worker_id is None and r.exists(f"{HEARTBEAT_PREFIX}{owner}"):
+            continue  # Owner is alive, however long its task takes
+        
+        for raw_id in r.lrange(processing, 0, -1):
+            task_id = raw_id.decode('utf-8')
+            claim = r.hget(CLAIMS_KEY, task_id)
+            try:
+                score = float(claim.decode('utf-8').rsplit("|", 1)[0])
+            except (AttributeError, ValueError):
+                score = _queue_score(1)  # Unknown claim: requeue at normal priority
+            
+            with r.pipeline(transaction=True) as pipe:
+                pipe.lrem(processing, 1, task_id)
+                pipe.zadd(QUEUE_KEY, {task_id: score})
+                pipe.hdel(CLAIMS_KEY, task_id)
+                pipe.execute()
+            requeued += 1
+            logger.warning(f"♻️ Requeued orphaned task {task_id} from {owner}")
+    return requeued
 
 def update_status(task_id, status, result=None, error=None):
-    """Update task status in Redis."""
-    key = f"{KEY_PREFIX}{task_id}"
-    data = r.get(key)
-    if data:
-        task = json.loads(data)
-        task['status'] = status
-        if result: task['result'] = result
-        if error: task['error'] = error
-        r.set(key, json.dumps(task), ex=86400) # Reset TTL on update
+    """Update task status in Redis (single atomic round-trip)."""
+    UPDATE_SCRIPT(
+        keys=[f"{KEY_PREFIX}{task_id}"],
+        args=[
+            status,
+            pack_payload(result) if result else "",
+            error or "",
+            TASK_TTL,  # Reset TTL on update
+            STATUS_INDEX_PREFIX,
+            task_id
+        ]
+    )
+
+def _decode_task(fields):
+    """Rebuild the task dict from its hash fields (None if missing)."""
+    if not fields:
+        return None
+    task = unpack_payload(fields[b"data"])
+    task["status"] = fields[b"status"].decode("utf-8")
+    task["result"] = unpack_payload(fields[b"result"]) if b"result" in fields else None
+    task["error"] = fields[b"error"].decode("utf-8") if b"error" in fields else None
+    return task
 
 def get_task_info(task_id):
-    data = r.get(f"{KEY_PREFIX}{task_id}")
-    return json.loads(data) if data else None
+    return _decode_task(r.hgetall(f"{KEY_PREFIX}{task_id}"))
+
+def get_task_infos(task_ids):
+    """Fetch many tasks in one round-trip: {task_id: info or None}."""
+    with r.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            pipe.hgetall(f"{KEY_PREFIX}{task_id}")
+        rows = pipe.execute()
+    return {task_id: _decode_task(fields) for task_id, fields in zip(task_ids, rows)}
+
+def iter_tasks(batch_size=500):
+    """Yield every stored task using SCAN (never blocks Redis like KEYS)."""
+    prefix_len = len(KEY_PREFIX)
+    batch = []
+    for key in r.scan_iter(match=f"{KEY_PREFIX}*", count=batch_size):
+        batch.append(key.decode("utf-8")[prefix_len:])
+        if len(batch) >= batch_size:
+            yield from (t for t in get_task_infos(batch).values() if t)
+            batch = []
+    if batch:
+        yield from (t for t in get_task_infos(batch).values() if t)
+
+def find_tasks(status=None, task_type=None):
+    """
+    Tasks matching a status and/or type, via the index sets.
+    
+    Cost is O(matching tasks), not a scan of every task key.
+    """
+    indexes = []
+    if status:
+        indexes.append(f"{STATUS_INDEX_PREFIX}{status}")
+    if task_type:
+        indexes.append(f"{TYPE_INDEX_PREFIX}{task_type}")
+    if not indexes:
+        return list(iter_tasks())
+    
+    task_ids = [t.decode('utf-8') for t in r.sinter(indexes)]
+    infos = get_task_infos(task_ids)
+    
+    # Drop ids whose task hash has expired
+    expired = [tid for tid, info in infos.items() if info is None]
+    if expired:
+        with r.pipeline(transaction=False) as pipe:
+            for index in indexes:
+                pipe.srem(index, *expired)
+            pipe.execute()
+    return [info for info in infos.values() if info]
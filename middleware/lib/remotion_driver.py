@@ -1,11 +1,184 @@
+import asyncio
+import codecs
 import subprocess
 import os
-import json
+import orjson
 import logging
+import selectors
+import threading
 import time
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+TAIL_LINES = 500  # Lines of each stream kept for failure reports
+# Pretty-print the timeline JSON for debugging (compact in production)
+DEBUG_TIMELINE = os.getenv("REMOTION_DEBUG_TIMELINE", "false").lower() == "true"
+# Render through one persistent ts-node process (set false for one-shot CLI)
+USE_DAEMON = os.getenv("REMOTION_DAEMON", "true").lower() == "true"
+RESULT_PREFIX = "@@RESULT "  # Marks protocol lines from render_daemon.ts
+
+# Robustly find 'rendering' dir relative to this file (middleware/lib/remotion_driver.py)
+# Expected: ../../rendering
+RENDERING_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../rendering")
+)
+
+
+def _stream_output(process):
+    """
+    Log a process's stdout/stderr line by line until both pipes close.
+    
+    Returns:
+        (stdout_tail, stderr_tail): deques of the last TAIL_LINES lines
+    """
+    tails = {
+        process.stdout: deque(maxlen=TAIL_LINES),
+        process.stderr: deque(maxlen=TAIL_LINES)
+    }
+    
+    with selectors.DefaultSelector() as selector:
+        for pipe in tails:
+            selector.register(pipe, selectors.EVENT_READ)
+        
+        while selector.get_map():
+            for key, _ in selector.select():
+                line = key.fileobj.readline()
+                if not line:
+                    selector.unregister(key.fileobj)
+                    continue
+                line = line.rstrip()
+                tails[key.fileobj].append(line)
+                logger.info(f"   [remotion] {line}")
+    
+    return tails[process.stdout], tails[process.stderr]
+
+
+class RemotionWorker:
+    """
+    Persistent `ts-node render_daemon.ts` process.
+    
+    Node/ts-node start-up and the Remotion bundle are paid once instead of
+    per render. Jobs go in as JSON lines on stdin; the daemon answers each
+    with a RESULT_PREFIX line on stdout. Other output is logged. Renders
+    are serialised; a dead daemon is restarted on the next job.
+    """
+    
+    def __init__(self):
+        self._process = None
+        self._lock = threading.Lock()
+    
+    def _start(self):
+        logger.info("🎬 Starting Remotion render daemon")
+        self._process = subprocess.Popen(
+            ['nice', '-n', '15', 'npx', 'ts-node', 'render_daemon.ts'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=RENDERING_DIR,
+            text=True,
+            bufsize=1
+        )
+        if not self._read_result(deque(maxlen=TAIL_LINES)).get("ready"):
+            raise RuntimeError("Render daemon did not report ready")
+    
+    def _read_result(self, tail):
+        """Log daemon output until its next result line."""
+        for line in self._process.stdout:
+            line = line.rstrip()
+            if line.startswith(RESULT_PREFIX):
+                return orjson.loads(line[len(RESULT_PREFIX):])
+            tail.append(line)
+            logger.info(f"   [remotion] {line}")
+        
+        returncode = self._process.wait()
+        self._process = None
+        raise RuntimeError(f"Render daemon exited (Code {returncode})")
+    
+    def render(self, timeline_path, output_path):
+        """
+        Render one timeline.
+        
+        Returns:
+            (result, tail): daemon result dict ({"ok", "duration_ms", ...})
+            and the last TAIL_LINES log lines of this job
+        """
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+            
+            job = {"timelinePath": timeline_path, "outputPath": output_path}
+            self._process.stdin.write(orjson.dumps(job).decode() + "\n")
+            self._process.stdin.flush()
+            
+            tail = deque(maxlen=TAIL_LINES)
+            return self._read_result(tail), tail
+    
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()  # Daemon exits when stdin closes
+                try:
+                    self._process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+
+_worker = None
+
+
+def get_remotion_worker():
+    """Get or create the render daemon singleton."""
+    global _worker
+    if _worker is None:
+        _worker = RemotionWorker()
+    return _worker
+
+
+def _write_timeline(timeline_data, output_path):
+    """Save the timeline JSON next to the output; returns its path."""
+    temp_json_path = output_path.replace('.mp4', '.json')
+    # Write-then-rename so the renderer never reads a truncated file
+    tmp_path = temp_json_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(timeline_data, option=orjson.OPT_INDENT_2 if DEBUG_TIMELINE else 0))
+    os.replace(tmp_path, temp_json_path)
+    return temp_json_path
+
+
+def _render_once(temp_json_path, output_path):
+    """One-shot render via `ts-node render_cli.ts` (fallback path)."""
+    # nice -n 15: Low priority
+    # npx ts-node render_cli.ts: The script we wrote
+    cmd = [
+        'nice', '-n', '15',
+        'npx', 'ts-node', 'render_cli.ts',
+        temp_json_path,
+        output_path
+    ]
+    
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=RENDERING_DIR,
+        text=True,
+        bufsize=1
+    )
+    
+    # Stream logs as they arrive; keep only the tail for the error path
+    stdout, stderr = _stream_output(process)
+    returncode = process.wait()
+    
+    if returncode != 0:
+        logger.error(f"❌ Render Failed (Code {returncode})")
+        logger.error(f"STDOUT (last {TAIL_LINES} lines): " + "\n".join(stdout))
+        logger.error(f"STDERR (last {TAIL_LINES} lines): " + "\n".join(stderr))
+        return False
+    return True
+
+
 def execute_render(timeline_data, output_path):
     """
     Executes a Remotion render using the local CLI.
@@ -19,44 +192,25 @@ def execute_render(timeline_data, output_path):
     """
     try:
         # 1. Save Timeline JSON to a temp file
-        temp_json_path = output_path.replace('.mp4', '.json')
-        with open(temp_json_path, 'w') as f:
-            json.dump(timeline_data, f, indent=2)
+        temp_json_path = _write_timeline(timeline_data, output_path)
             
         logger.info(f"🎬 Starting Remotion Render: {output_path}")
         logger.info(f"   Timeline: {temp_json_path}")
 
-        # 2. Build the Command
-        # nice -n 15: Low priority
-        # npx ts-node render_cli.ts: The script we wrote
-        cmd = [
-            'nice', '-n', '15',
-            'npx', 'ts-node', 'render_cli.ts',
-            temp_json_path,
-            output_path
-        ]
-        
-        # 3. Execute
-        # Robustly find 'rendering' dir relative to this file (middleware/lib/remotion_driver.py)
-        # Expected: ../../rendering
-        current_file_dir = os.path.dirname(os.path.abspath(__file__))
-        rendering_dir = os.path.abspath(os.path.join(current_file_dir, "../../rendering"))
-        
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=rendering_dir,
-            text=True
-        )
-        
-        # Stream logs
-        stdout, stderr = process.communicate()
+        # 2. Render via the persistent daemon, falling back to the one-shot CLI
+        if USE_DAEMON:
+            try:
+                result, tail = get_remotion_worker().render(temp_json_path, output_path)
+                if not result.get("ok"):
+                    logger.error(f"❌ Render Failed: {result.get('error')}")
+                    logger.error(f"OUTPUT (last {TAIL_LINES} lines): " + "\n".join(tail))
+                    return False
+                logger.info(f"✅ Render Complete! ({result.get('duration_ms')} ms)")
+                return True
+            except Exception as e:
+                logger.warning(f"⚠️ Render daemon unavailable ({e}), using one-shot CLI")
         
-        if process.returncode != 0:
-            logger.error(f"❌ Render Failed (Code {process.returncode})")
-            logger.error(f"STDOUT: {stdout}")
-            logger.error(f"STDERR: {stderr}")
+        if not _render_once(temp_json_path, output_path):
             return False
             
         logger.info(f"✅ Render Complete!")
@@ -65,3 +219,73 @@ def execute_render(timeline_data, output_path):
     except Exception as e:
         logger.error(f"❌ Render Exception: {e}")
         return False
+
+
+async def _render_once_async(temp_json_path, output_path):
+    """Async one-shot render; the event loop supervises the subprocess."""
+    process = await asyncio.create_subprocess_exec(
+        'nice', '-n', '15',
+        'npx', 'ts-node', 'render_cli.ts',
+        temp_json_path,
+        output_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=RENDERING_DIR
+    )
+    
+    async def pump(stream):
+        # Split on \r as well: Remotion redraws its progress bar in place,
+        # which readline() would accumulate into one unbounded line
+        tail = deque(maxlen=TAIL_LINES)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while chunk := await stream.read(65536):
+            *lines, pending = (pending + decoder.decode(chunk)).replace("\r", "\n").split("\n")
+            for line in lines:
+                if line.strip():
+                    tail.append(line.rstrip())
+                    logger.info(f"   [remotion] {line.rstrip()}")
+        if pending.strip():
+            tail.append(pending.rstrip())
+            logger.info(f"   [remotion] {pending.rstrip()}")
+        return tail
+    
+    stdout, stderr = await asyncio.gather(pump(process.stdout), pump(process.stderr))
+    returncode = await process.wait()
+    
+    if returncode != 0:
+        logger.error(f"❌ Render Failed (Code {returncode})")
+        logger.error(f"STDOUT (last {TAIL_LINES} lines): " + "\n".join(stdout))
+        logger.error(f"STDERR (last {TAIL_LINES} lines): " + "\n".join(stderr))
+        return False
+    return True
+
+
+async def execute_render_async(timeline_data, output_path):
+    """
+    Async variant of execute_render for event-loop callers.
+    
+    Daemon renders are handed to a thread (the daemon serialises them
+    anyway); one-shot renders run under asyncio.create_subprocess_exec,
+    so a single loop can supervise many concurrent renders.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if USE_DAEMON:
+        return await asyncio.to_thread(execute_render, timeline_data, output_path)
+    
+    try:
+        temp_json_path = await asyncio.to_thread(_write_timeline, timeline_data, output_path)
+        logger.info(f"🎬 Starting Remotion Render: {output_path}")
+        logger.info(f"   Timeline: {temp_json_path}")
+        
+        if not await _render_once_async(temp_json_path, output_path):
+            return False
+        
+        logger.info(f"✅ Render Complete!")
+        return True
+    
+    except Exception as e:
+        logger.error(f"❌ Render Exception: {e}")
+        return False
@@ -22,20 +22,83 @@ Usage:
     context = re.get_graph_context_for_llm()
 """
 
+import io
 import logging
 import sys
 import os
-from typing import Dict, List, Optional, Any
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime
 
 logger = logging.getLogger("ReportEngine")
 
+GRAPH_FETCH_WORKERS = 8  # Concurrent get_topic_cco calls in build_graphs_from_topics
+
+try:
+    import markdown
+    MARKDOWN_AVAILABLE = True
+except ImportError:
+    markdown = None
+    MARKDOWN_AVAILABLE = False
+
+# Static HTML shell around rendered reports
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>舆情分析报告</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; line-height: 1.6; }
+        h1, h2, h3 { color: #333; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f4f4f4; }
+        code { background-color: #f4f4f4; padding: 2px 6px; border-radius: 3px; }
+    </style>
+</head>
+<body>
+"""
+_HTML_TAIL = """
+</body>
+</html>"""
+
 # Add BettaFish to path
 BETTAFISH_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '../../external/BettaFish')
 )
 
 
+def _compile_template(template: str) -> Callable[[Dict], str]:
+    """
+    Pre-parse a str.format template into a render(fields) closure.
+    
+    Rendering then only concatenates literals and formatted values instead
+    of re-parsing the template on every report. Templates using attribute/
+    index/positional fields or nested specs fall back to str.format.
+    """
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(template):
+        if name is not None and (
+            not name or name.isdigit() or '.' in name or '[' in name or '{' in (spec or '')
+        ):
+            return lambda fields: template.format(**fields)
+        parts.append((literal, name, spec or '', conversion))
+    
+    convert = {None: lambda v: v, 's': str, 'r': repr, 'a': ascii}
+    
+    def render(fields: Dict) -> str:
+        out = []
+        for literal, name, spec, conversion in parts:
+            out.append(literal)
+            if name is not None:
+                out.append(format(convert[conversion](fields[name]), spec))
+        return ''.join(out)
+    
+    return render
+
+
 class ReportEngineWrapper:
     """
     Wrapper for BettaFish ReportEngine GraphRAG capabilities.
@@ -51,6 +114,12 @@ class ReportEngineWrapper:
         self._graph = None
         self._bettafish_client = None
         self._modules_loaded = False
+        # Graph reads memoised per graph version (bumped in build_graph_from_topic)
+        self._graph_version = 0
+        self._cache: Dict[str, tuple] = {}
+        self._template_cache: Optional[tuple] = None  # (dir mtime_ns, names)
+        self._compiled_templates: Dict[str, tuple] = {}  # path -> (mtime_ns, render)
+        self._graph_cls = None  # ReportEngine.graphrag.Graph, resolved once
         logger.info("ReportEngineWrapper initialized")
     
     def _load_graphrag_modules(self):
@@ -69,6 +138,32 @@ class ReportEngineWrapper:
         
         self._modules_loaded = True
     
+    def _get_graph_class(self):
+        """Resolve BettaFish's Graph class once (lazy: needs sys.path setup)."""
+        if self._graph_cls is None:
+            self._load_graphrag_modules()
+            from ReportEngine.graphrag import Graph
+            self._graph_cls = Graph
+        return self._graph_cls
+    
+    def _graph_cached(self, key: str, compute):
+        """Return compute() memoised until the graph is rebuilt."""
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == self._graph_version:
+            return entry[1]
+        value = compute()
+        self._cache[key] = (self._graph_version, value)
+        return value
+    
+    def _get_stats(self) -> Dict:
+        return self._graph_cached('stats', self._graph.get_stats)
+    
+    def _get_nodes(self, node_type: str) -> List:
+        return self._graph_cached(
+            f'nodes:{node_type}',
+            lambda: list(self._graph.get_nodes_by_type(node_type))
+        )
+    
     def _get_bettafish_client(self):
         """Get our working bettafish client."""
         if self._bettafish_client is None:
@@ -79,7 +174,9 @@ class ReportEngineWrapper:
     def build_graph_from_topic(
         self, 
         topic_id: str, 
-        platform: str
+        platform: str,
+        cco: Optional[Dict] = None,
+        now: Optional[datetime] = None
     ) -> Dict:
         """
         Build a knowledge graph from a topic's research data.
@@ -93,20 +190,23 @@ class ReportEngineWrapper:
         Args:
             topic_id: Topic ID
             platform: Platform name
+            cco: Pre-fetched topic CCO (fetched from BettaFish if None)
+            now: Build timestamp (shared across a batch; defaults to now)
             
         Returns:
             Graph summary dict
         """
         try:
-            self._load_graphrag_modules()
-            from ReportEngine.graphrag import Graph
+            Graph = self._get_graph_class()
             
             # Get topic data
-            bf = self._get_bettafish_client()
-            cco = bf.get_topic_cco(topic_id, platform)
+            if cco is None:
+                bf = self._get_bettafish_client()
+                cco = bf.get_topic_cco(topic_id, platform)
             
             # Initialize graph
             self._graph = Graph()
+            self._graph_version += 1
             
             # Create central topic node using correct API
             topic_node = self._graph.add_node(
@@ -115,46 +215,54 @@ class ReportEngineWrapper:
                 node_id=f"topic_{topic_id}",
                 platform=platform,
                 author=cco.get('author', ''),
-                created=datetime.now().isoformat()
+                created=(now or datetime.now()).isoformat()
             )
             
-            # Add comment nodes
+            # Collect the satellite nodes as (relation, node spec), then
+            # insert them in one batch
+            satellites = []
+            
+            # Comment nodes
             vox = cco.get('vox_populi', {})
             for i, comment in enumerate(vox.get('top_resonant', [])[:10]):
                 comment_text = comment.get('text', '')[:100]
                 if comment_text:
-                    comment_node = self._graph.add_node(
+                    satellites.append(('has_comment', dict(
                         node_type='comment',
                         name=comment_text,
                         node_id=f"comment_{topic_id}_{i}",
                         likes=comment.get('likes', 0),
                         full_text=comment.get('text', '')
-                    )
-                    self._graph.add_edge(topic_node, comment_node, 'has_comment')
+                    )))
             
-            # Add keyword nodes from vernacular cloud
+            # Keyword nodes from vernacular cloud
             for keyword in vox.get('vernacular_cloud', [])[:15]:
-                keyword_node = self._graph.add_node(
+                satellites.append(('has_keyword', dict(
                     node_type='keyword',
                     name=keyword,
                     node_id=f"keyword_{keyword}",
                     source='vernacular_cloud'
-                )
-                self._graph.add_edge(topic_node, keyword_node, 'has_keyword')
+                )))
             
-            # Add sentiment node if available
+            # Sentiment node if available
             sentiment = cco.get('sentiment', {})
             if sentiment.get('dominant'):
-                sentiment_node = self._graph.add_node(
+                satellites.append(('has_sentiment', dict(
                     node_type='sentiment',
                     name=sentiment.get('dominant', 'neutral'),
                     node_id=f"sentiment_{topic_id}",
                     distribution=str(sentiment.get('distribution', {})),
                     confidence=sentiment.get('average_confidence', 0)
-                )
-                self._graph.add_edge(topic_node, sentiment_node, 'has_sentiment')
+                )))
+            
+            nodes = self._add_nodes(self._graph, [spec for _, spec in satellites])
+            self._add_edges(self._graph, [
+                (topic_node, node, relation)
+                for (relation, _), node in zip(satellites, nodes)
+            ])
             
-            stats = self._graph.get_stats()
+            self._graph_version += 1  # Invalidate reads taken mid-build
+            stats = self._get_stats()
             logger.info(f"Built graph for topic {topic_id}: {stats}")
             
             return {
@@ -168,11 +276,77 @@ class ReportEngineWrapper:
             }
             
         except Exception as e:
-            logger.error(f"Failed to build graph: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Failed to build graph: {e}")
             return {"success": False, "error": str(e)}
     
+    @staticmethod
+    def _add_nodes(graph, specs: List[Dict]) -> List:
+        """
+        Insert nodes in one call when the Graph supports it.
+        
+        Uses Graph.add_nodes(specs) -> nodes (in order) if BettaFish
+        provides it, otherwise falls back to one add_node(**spec) each.
+        """
+        if hasattr(graph, 'add_nodes'):
+            return list(graph.add_nodes(specs))
+        return [graph.add_node(**spec) for spec in specs]
+    
+    @staticmethod
+    def _add_edges(graph, edges: List[Tuple]) -> None:
+        """Insert (source, target, relation) edges; batched if supported."""
+        if hasattr(graph, 'add_edges'):
+            graph.add_edges(edges)
+            return
+        for source, target, relation in edges:
+            graph.add_edge(source, target, relation)
+    
+    def build_graphs_from_topics(self, specs: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Build graphs for many topics, fetching their CCOs concurrently.
+        
+        The network-bound get_topic_cco calls run on a thread pool, each
+        worker with its own BettaFishClient (the client holds a session and
+        DB connection that are not known to be thread-safe); graph
+        construction stays serial since self._graph is shared. As with
+        calling build_graph_from_topic in a loop, the last topic's graph
+        remains loaded.
+        
+        Args:
+            specs: (topic_id, platform) pairs
+            
+        Returns:
+            Graph summary dicts in the same order as specs
+        """
+        if not specs:
+            return []
+        
+        from lib.bettafish_client import BettaFishClient
+        local = threading.local()
+        
+        def fetch(topic_id: str, platform: str) -> Dict:
+            bf = getattr(local, 'client', None)
+            if bf is None:
+                bf = local.client = BettaFishClient()
+            return bf.get_topic_cco(topic_id, platform)
+        
+        now = datetime.now()
+        results = []
+        
+        with ThreadPoolExecutor(max_workers=min(GRAPH_FETCH_WORKERS, len(specs))) as pool:
+            futures = [pool.submit(fetch, topic_id, platform)
+                       for topic_id, platform in specs]
+            
+            for (topic_id, platform), future in zip(specs, futures):
+                try:
+                    cco = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to fetch topic {topic_id}: {e}")
+                    results.append({"success": False, "error": str(e)})
+                    continue
+                results.append(self.build_graph_from_topic(topic_id, platform, cco=cco, now=now))
+        
+        return results
+    
     def get_graph_summary(self) -> Dict:
         """
         Get a summary of the current graph.
@@ -183,7 +357,7 @@ class ReportEngineWrapper:
         if self._graph is None:
             return {"error": "No graph loaded."}
         
-        return self._graph.get_summary()
+        return self._graph_cached('summary', self._graph.get_summary)
     
     def get_graph_context_for_llm(self, max_chars: int = 2000) -> str:
         """
@@ -201,36 +375,16 @@ class ReportEngineWrapper:
             return "No knowledge graph available."
         
         try:
-            summary = self._graph.get_summary()
-            stats = self._graph.get_stats()
-            
-            lines = [
-                f"# Knowledge Graph Summary",
-                f"Total Nodes: {stats.get('total_nodes', 0)}",
-                f"Total Edges: {stats.get('total_edges', 0)}",
-                "",
-                "## Node Types:"
-            ]
-            
-            for key, value in stats.items():
-                if key not in ['total_nodes', 'total_edges']:
-                    lines.append(f"- {key}: {value}")
-            
-            # Add key keywords
-            keywords = [n.name for n in self._graph.get_nodes_by_type('keyword')]
-            if keywords:
-                lines.append("")
-                lines.append(f"## Key Keywords: {', '.join(keywords[:15])}")
-            
-            # Add top comments
-            comments = [n.name for n in self._graph.get_nodes_by_type('comment')]
-            if comments:
-                lines.append("")
-                lines.append("## Top Comments:")
-                for c in comments[:5]:
-                    lines.append(f"- {c[:60]}...")
-            
-            text = "\n".join(lines)
+            # Stop assembling once past max_chars instead of slicing at the end
+            buf = io.StringIO()
+            for i, line in enumerate(self._iter_context_lines()):
+                if i:
+                    buf.write("\n")
+                buf.write(line)
+                if buf.tell() > max_chars:
+                    break
+            
+            text = buf.getvalue()
             
             # Truncate if too long
             if len(text) > max_chars:
@@ -242,11 +396,39 @@ class ReportEngineWrapper:
             logger.error(f"Failed to generate graph context: {e}")
             return f"Error generating graph context: {e}"
     
+    def _iter_context_lines(self) -> Iterator[str]:
+        """Yield the lines of get_graph_context_for_llm() lazily."""
+        stats = self._get_stats()
+        
+        yield "# Knowledge Graph Summary"
+        yield f"Total Nodes: {stats.get('total_nodes', 0)}"
+        yield f"Total Edges: {stats.get('total_edges', 0)}"
+        yield ""
+        yield "## Node Types:"
+        
+        for key, value in stats.items():
+            if key not in ['total_nodes', 'total_edges']:
+                yield f"- {key}: {value}"
+        
+        # Add key keywords
+        keywords = [n.name for n in self._get_nodes('keyword')[:15]]
+        if keywords:
+            yield ""
+            yield f"## Key Keywords: {', '.join(keywords)}"
+        
+        # Add top comments
+        comments = [n.name for n in self._get_nodes('comment')[:5]]
+        if comments:
+            yield ""
+            yield "## Top Comments:"
+            for c in comments:
+                yield f"- {c[:60]}..."
+    
     def get_keywords(self) -> List[str]:
         """Get all keywords from the graph."""
         if self._graph is None:
             return []
-        return [n.name for n in self._graph.get_nodes_by_type('keyword')]
+        return [n.name for n in self._get_nodes('keyword')]
     
     def get_top_comments(self, limit: int = 5) -> List[Dict]:
         """Get top comments from the graph."""
@@ -254,7 +436,7 @@ class ReportEngineWrapper:
             return []
         
         comments = []
-        for n in self._graph.get_nodes_by_type('comment')[:limit]:
+        for n in self._get_nodes('comment')[:limit]:
             comments.append({
                 "text": n.name,
                 "likes": n.get('likes', 0)
@@ -270,17 +452,26 @@ class ReportEngineWrapper:
         """
         try:
             template_dir = os.path.join(BETTAFISH_PATH, 'ReportEngine', 'report_template')
-            if not os.path.exists(template_dir):
+            try:
+                mtime_ns = os.stat(template_dir).st_mtime_ns
+            except FileNotFoundError:
                 logger.warning(f"Template directory not found: {template_dir}")
                 return []
             
-            templates = []
-            for f in os.listdir(template_dir):
-                if f.endswith('.md'):
-                    templates.append(f[:-3])  # Remove .md extension
+            # Directory mtime changes whenever a template is added/removed/renamed
+            if self._template_cache and self._template_cache[0] == mtime_ns:
+                return list(self._template_cache[1])
             
+            with os.scandir(template_dir) as entries:
+                templates = sorted(
+                    entry.name[:-3]  # Remove .md extension
+                    for entry in entries
+                    if entry.name.endswith('.md') and entry.is_file(follow_symlinks=False)
+                )
+            
+            self._template_cache = (mtime_ns, templates)
             logger.info(f"Found {len(templates)} report templates")
-            return sorted(templates)
+            return list(templates)
             
         except Exception as e:
             logger.error(f"Failed to list templates: {e}")
@@ -290,7 +481,8 @@ class ReportEngineWrapper:
         self,
         topic_data: Dict,
         template_name: str = None,
-        output_format: str = "markdown"
+        output_format: str = "markdown",
+        now: Optional[datetime] = None
     ) -> Dict:
         """
         Generate a professional report using BettaFish templates.
@@ -299,6 +491,7 @@ class ReportEngineWrapper:
             topic_data: Topic data including CCO, sentiment, citations
             template_name: Template to use (None for auto-select)
             output_format: "markdown", "html", or "both"
+            now: Report timestamp (shared across a batch; defaults to now)
             
         Returns:
             {
@@ -320,14 +513,10 @@ class ReportEngineWrapper:
                 f"{template_name}.md"
             )
             
-            if os.path.exists(template_path):
-                with open(template_path, 'r', encoding='utf-8') as f:
-                    template_content = f.read()
-            else:
-                template_content = self._get_default_template()
+            template = self._get_compiled_template(template_path)
             
             # Fill template with data
-            report_md = self._fill_template(template_content, topic_data)
+            report_md = self._fill_template(template, topic_data, now)
             
             result = {
                 "success": True,
@@ -343,13 +532,33 @@ class ReportEngineWrapper:
             return result
             
         except Exception as e:
-            import traceback
-            logger.error(f"Report generation failed: {e}\n{traceback.format_exc()}")
+            logger.exception(f"Report generation failed: {e}")
             return {
                 "success": False,
                 "error": str(e)
             }
     
+    def _get_compiled_template(self, template_path: str) -> Callable[[Dict], str]:
+        """Load and compile a template, cached by path and file mtime."""
+        try:
+            mtime_ns = os.stat(template_path).st_mtime_ns
+        except FileNotFoundError:
+            template_path, mtime_ns = "<default>", 0
+        
+        cached = self._compiled_templates.get(template_path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        
+        if mtime_ns:
+            with open(template_path, 'r', encoding='utf-8') as f:
+                template_content = f.read()
+        else:
+            template_content = self._get_default_template()
+        
+        render = _compile_template(template_content)
+        self._compiled_templates[template_path] = (mtime_ns, render)
+        return render
+    
     def _get_default_template(self) -> str:
         """Get default report template."""
         return """# {title}
@@ -385,9 +594,8 @@ class ReportEngineWrapper:
 *本报告由MCN OS自动生成*
 """
     
-    def _fill_template(self, template: str, data: Dict) -> str:
-        """Fill template with topic data."""
-        from datetime import datetime
+    def _fill_template(self, template, data: Dict, now: Optional[datetime] = None) -> str:
+        """Fill template (str or compiled renderer) with topic data."""
         
         # Extract data with defaults
         title = data.get('title', '舆情分析报告')
@@ -426,60 +634,47 @@ class ReportEngineWrapper:
         # Conclusions
         conclusions = data.get('conclusions', '基于以上分析，建议进一步深入研究。')
         
+        if isinstance(template, str):
+            template = _compile_template(template)
+        
         # Fill template
-        filled = template.format(
+        filled = template(dict(
             title=title,
             summary=summary or '待分析',
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M"),
+            timestamp=(now or datetime.now()).strftime("%Y-%m-%d %H:%M"),
             platform=platform,
             record_count=data.get('record_count', 0),
             sentiment_section=sentiment_section,
             keywords_section=keywords_section,
             comments_section=comments_section,
             conclusions=conclusions
-        )
+        ))
         
         return filled
     
     def _render_markdown_to_html(self, markdown_text: str) -> str:
         """Render markdown to HTML."""
-        try:
-            import markdown
-            html = markdown.markdown(markdown_text, extensions=['tables', 'fenced_code'])
-            
-            # Wrap in basic HTML structure
-            full_html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>舆情分析报告</title>
-    <style>
-        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; line-height: 1.6; }}
-        h1, h2, h3 {{ color: #333; }}
-        table {{ border-collapse: collapse; width: 100%; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f4f4f4; }}
-        code {{ background-color: #f4f4f4; padding: 2px 6px; border-radius: 3px; }}
-    </style>
-</head>
-<body>
-{html}
-</body>
-</html>"""
-            return full_html
-            
-        except ImportError:
+        if not MARKDOWN_AVAILABLE:
             logger.warning("markdown library not available, returning raw markdown")
             return f"<pre>{markdown_text}</pre>"
+        
+        html = markdown.markdown(markdown_text, extensions=['tables', 'fenced_code'])
+        
+        # Wrap in basic HTML structure
+        return _HTML_HEAD + html + _HTML_TAIL
 
 
 # Singleton
 _engine: Optional[ReportEngineWrapper] = None
+_engine_lock = threading.Lock()
 
 
 def get_report_engine() -> ReportEngineWrapper:
-    """Get or create the ReportEngine wrapper singleton."""
+    """Get or create the ReportEngine wrapper singleton (thread-safe)."""
     global _engine
     if _engine is None:
-        _engine = ReportEngineWrapper()
+        # Lock only on the cold path; concurrent first calls build one wrapper
+        with _engine_lock:
+            if _engine is None:
+                _engine = ReportEngineWrapper()
     return _engine
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+ScriptCache
+===========
+SQLite cache of generated storyboards for /bettafish/generate_script.
+
+Lookups go in two steps:
+- exact: sha256 of (topic_id, platform, persona, style, additional_context)
+- semantic: cosine similarity between prompt embeddings, over the most
+  recent rows generated for the same topic and platform/persona/style
+  (prompts share one template, so different topics can look alike)
+
+A hit skips the 10-60s Gemini round trip. Methods are blocking (sqlite3);
+async callers run them via asyncio.to_thread.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger("ScriptCache")
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "script_cache.db"
+)
+
+
+class ScriptCache:
+    """Exact + semantic storyboard cache backed by one SQLite file."""
+    
+    TTL_SECONDS = int(os.getenv("SCRIPT_CACHE_TTL", 3600))
+    SIMILARITY_THRESHOLD = float(os.getenv("SCRIPT_CACHE_SIMILARITY", 0.92))
+    SCAN_LIMIT = 200  # Most recent rows compared on a semantic lookup
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("SCRIPT_CACHE_PATH", DEFAULT_DB_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        
+        # One connection shared across to_thread workers, serialised by the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS script_cache ("
+            " key TEXT PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " embedding BLOB,"
+            " storyboard TEXT NOT NULL,"
+            " ts INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_script_cache_scope_ts ON script_cache (scope, ts)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(
+        topic_id: str,
+        platform: str,
+        persona: str,
+        style: str,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """Exact-match key for one generate_script request."""
+        raw = "|".join((topic_id, platform, persona, style, additional_context or ""))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def make_scope(topic_id: str, platform: str, persona: str, style: str) -> str:
+        """Semantic matches never cross topic, platform, persona or style."""
+        return f"{topic_id}|{platform}|{persona}|{style}"
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the storyboard cached under key, if younger than the TTL."""
+        cutoff = int(time.time()) - self.TTL_SECONDS
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT storyboard FROM script_cache WHERE key = ? AND ts >= ?",
+                (key, cutoff)
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    def find_similar(self, scope: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Return the most similar fresh storyboard in scope above the threshold.
+        
+        Args:
+            scope: make_scope() of the request
+            embedding: Embedding of the assembled prompt
+        
+        Returns:
+            Cached storyboard, or None if nothing is similar enough
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        
+        cutoff = int(time.time()) - self.TTL_SECONDS
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT embedding, storyboard FROM script_cache"
+                " WHERE scope = ? AND ts >= ? AND embedding IS NOT NULL"
+                " ORDER BY ts DESC LIMIT ?",
+                (scope, cutoff, self.SCAN_LIMIT)
+            ).fetchall()
+        
+        rows = [(blob, storyboard) for blob, storyboard in rows if len(blob) == query.nbytes]
+        if not rows:
+            return None
+        
+        # One matrix product scores every candidate
+        matrix = np.frombuffer(b"".join(blob for blob, _ in rows), dtype=np.float32)
+        matrix = matrix.reshape(len(rows), query.size)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = np.inf
+        scores = matrix @ query / (norms * norm)
+        
+        best = int(np.argmax(scores))
+        if scores[best] < self.SIMILARITY_THRESHOLD:
+            return None
+        logger.info(f"Semantic script cache hit (similarity={scores[best]:.3f})")
+        return orjson.loads(rows[best][1])
+    
+    def put(
+        self,
+        key: str,
+        scope: str,
+        storyboard: Dict[str, Any],
+        embedding: Optional[List[float]] = None
+    ):
+        """Store a storyboard (and its prompt embedding, if any)."""
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO script_cache (key, scope, embedding, storyboard, ts)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, scope, blob, orjson.dumps(storyboard).decode(), int(time.time()))
+            )
+            self._conn.commit()
+    
+    def prune(self) -> int:
+        """Delete rows past the TTL; returns how many were removed."""
+        cutoff = int(time.time()) - self.TTL_SECONDS
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM script_cache WHERE ts < ?", (cutoff,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Singleton
+_cache: Optional[ScriptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_script_cache() -> ScriptCache:
+    """Get or create the ScriptCache singleton."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScriptCache()
+    return _cache
@@ -108,12 +108,16 @@ DEFAULT_SERVICES: Dict[str, ServiceConfig] = {
 }
 
 
+# Reverse index: pipeline phase -> service names (built once at import)
+_PHASE_INDEX: Dict[int, List[str]] = {}
+for _name, _config in DEFAULT_SERVICES.items():
+    for _phase in _config.pipeline_phases:
+        _PHASE_INDEX.setdefault(_phase, []).append(_name)
+
+
 def get_services_for_phase(phase: int) -> List[str]:
     """Get service names required for a pipeline phase."""
-    return [
-        name for name, config in DEFAULT_SERVICES.items()
-        if phase in config.pipeline_phases
-    ]
+    return list(_PHASE_INDEX.get(phase, ()))
 
 
 def get_service_config(name: str) -> Optional[ServiceConfig]:
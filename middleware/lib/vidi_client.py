@@ -10,12 +10,30 @@ import os
 import re
 import subprocess
 import logging
+import time
 import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from typing import List, Optional, Dict, Tuple
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+    TOOLBELT_AVAILABLE = True
+except ImportError:
+    TOOLBELT_AVAILABLE = False
+    logger.warning("requests-toolbelt not installed, Vidi uploads are buffered in memory")
+
+# Quiet, non-interactive ffmpeg: only errors reach stderr, never reads stdin
+_FFMPEG = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+
+# Range of two HH:MM:SS(.ss) times, e.g. "00:00:10.00-00:00:15.50"
+_TIMESTAMP_RANGE_RE = re.compile(
+    r'(\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)-(\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)'
+)
+
 
 class VidiClient:
     """Client for Vidi 7B video understanding model.
@@ -24,6 +42,10 @@ class VidiClient:
     similar to ComfyUI architecture.
     """
 
+    AVAILABLE_TTL = 30.0  # seconds to trust a successful health check
+    UNAVAILABLE_TTL = 5.0  # seconds before re-probing a failed one
+    RESULT_CACHE_SIZE = 64  # inference results kept per (video, task, question)
+
     def __init__(self, base_url: str = "http://host.docker.internal:8099"):
         """Initialize Vidi client.
 
@@ -31,27 +53,90 @@ class VidiClient:
             base_url: Base URL for Vidi server (default: host.docker.internal:8099)
         """
         self.base_url = base_url.rstrip('/')
-        self._available = None
+        self._available: Optional[Tuple[bool, float]] = None  # (value, expires_at)
+        self._result_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+        # Keep-alive pool to the single Vidi host
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
         logger.info(f"Initialized VidiClient with base_url: {self.base_url}")
 
     def is_available(self) -> bool:
         """Check if Vidi server is available.
 
+        The result is cached for AVAILABLE_TTL seconds when up and
+        UNAVAILABLE_TTL seconds when down, so a recovered server is noticed.
+
         Returns:
             bool: True if server is reachable and responding
         """
-        if self._available is not None:
-            return self._available
+        now = time.monotonic()
+        if self._available is not None and now < self._available[1]:
+            return self._available[0]
 
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
-            self._available = response.status_code == 200
-            logger.info(f"Vidi availability check: {self._available}")
-            return self._available
+            response = self._session.get(f"{self.base_url}/health", timeout=5)
+            available = response.status_code == 200
+            logger.info(f"Vidi availability check: {available}")
         except Exception as e:
             logger.warning(f"Vidi not available: {e}")
-            self._available = False
-            return False
+            available = False
+
+        ttl = self.AVAILABLE_TTL if available else self.UNAVAILABLE_TTL
+        self._available = (available, now + ttl)
+        return available
+
+    def _post_inference(self, video_path: str, question: str, task: str, timeout: int) -> Dict:
+        """POST a video + question to /inference and return the JSON result.
+
+        With requests-toolbelt the multipart body is streamed from disk in
+        chunks; plain `files=` would read the whole video into memory first.
+
+        Results are cached by file identity (path, size, mtime), task and
+        question, so repeating a query on an unchanged video skips the
+        upload entirely.
+        """
+        st = os.stat(video_path)
+        key = (os.path.realpath(video_path), st.st_size, st.st_mtime_ns, task, question)
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            self._result_cache.move_to_end(key)
+            logger.info(f"Vidi {task} result served from cache")
+            return cached
+
+        result = self._upload_inference(video_path, question, task, timeout)
+
+        self._result_cache[key] = result
+        if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+        return result
+
+    def _upload_inference(self, video_path: str, question: str, task: str, timeout: int) -> Dict:
+        """Upload the video with the question; returns the server's JSON."""
+        with open(video_path, 'rb') as video_file:
+            if TOOLBELT_AVAILABLE:
+                encoder = MultipartEncoder(fields={
+                    'video': (os.path.basename(video_path), video_file, 'video/mp4'),
+                    'question': question,
+                    'task': task
+                })
+                response = self._session.post(
+                    f"{self.base_url}/inference",
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type},
+                    timeout=timeout
+                )
+            else:
+                response = self._session.post(
+                    f"{self.base_url}/inference",
+                    files={'video': video_file},
+                    data={'question': question, 'task': task},
+                    timeout=timeout
+                )
+            response.raise_for_status()
+            return response.json()
 
     def ask_vqa(self, video_path: str, question: str, timeout: int = 120) -> str:
         """Ask a question about a video (Video Question Answering).
@@ -77,25 +162,10 @@ class VidiClient:
         logger.info(f"Asking Vidi VQA: {question[:100]}...")
 
         try:
-            with open(video_path, 'rb') as video_file:
-                files = {'video': video_file}
-                data = {
-                    'question': question,
-                    'task': 'vqa'  # Generic VQA task
-                }
-
-                response = requests.post(
-                    f"{self.base_url}/inference",
-                    files=files,
-                    data=data,
-                    timeout=timeout
-                )
-                response.raise_for_status()
-
-                result = response.json()
-                answer = result.get('answer', '')
-                logger.info(f"Vidi VQA response: {answer[:200]}...")
-                return answer
+            result = self._post_inference(video_path, question, 'vqa', timeout)  # Generic VQA task
+            answer = result.get('answer', '')
+            logger.info(f"Vidi VQA response: {answer[:200]}...")
+            return answer
 
         except requests.RequestException as e:
             logger.error(f"Vidi VQA request failed: {e}")
@@ -125,28 +195,13 @@ class VidiClient:
         logger.info(f"Finding timestamps for: {query[:100]}...")
 
         try:
-            with open(video_path, 'rb') as video_file:
-                files = {'video': video_file}
-                data = {
-                    'question': query,
-                    'task': 'retrieval'  # Temporal grounding task
-                }
-
-                response = requests.post(
-                    f"{self.base_url}/inference",
-                    files=files,
-                    data=data,
-                    timeout=timeout
-                )
-                response.raise_for_status()
-
-                result = response.json()
-                timestamps_str = result.get('answer', '')
+            result = self._post_inference(video_path, query, 'retrieval', timeout)  # Temporal grounding task
+            timestamps_str = result.get('answer', '')
 
-                # Parse timestamps from format: "00:00:10.00-00:00:15.50, 00:00:30.00-00:00:35.00"
-                timestamps = self._parse_timestamps(timestamps_str)
-                logger.info(f"Found {len(timestamps)} timestamp ranges")
-                return timestamps
+            # Parse timestamps from format: "00:00:10.00-00:00:15.50, 00:00:30.00-00:00:35.00"
+            timestamps = self._parse_timestamps(timestamps_str)
+            logger.info(f"Found {len(timestamps)} timestamp ranges")
+            return timestamps
 
         except requests.RequestException as e:
             logger.error(f"Vidi timestamp request failed: {e}")
@@ -168,46 +223,101 @@ class VidiClient:
             RuntimeError: If ffmpeg is not available
         """
         os.makedirs(output_dir, exist_ok=True)
-        clip_paths = []
+        if not timestamps:
+            return []
 
         video_name = Path(video_path).stem
+        outputs = [
+            os.path.join(output_dir, f"{video_name}_clip_{i+1}.mp4")
+            for i in range(len(timestamps))
+        ]
+
+        def _remove_outputs():
+            for output_path in outputs:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+
+        # Clear stale clips so an old file is never mistaken for this run's output
+        _remove_outputs()
+
+        # One ffmpeg run with N outputs: the source is opened and demuxed once
+        cmd = [*_FFMPEG, '-y', '-i', video_path]
+        for (start, end), output_path in zip(timestamps, outputs):
+            cmd += [
+                '-ss', str(start),
+                '-to', str(end),
+                '-c', 'copy',  # Copy codec (fast, no re-encoding)
+                output_path
+            ]
+
+        logger.info(f"Extracting {len(timestamps)} clips in one ffmpeg pass")
+        batch_ok = False
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=60 * len(timestamps)
+            )
+            batch_ok = result.returncode == 0
+            if not batch_ok:
+                logger.error(f"ffmpeg batch extraction failed: {result.stderr[-2000:]}")
+        except subprocess.TimeoutExpired:
+            logger.error("ffmpeg timeout for batch clip extraction")
+        except Exception as e:
+            logger.error(f"Batch clip extraction failed: {e}")
 
-        for i, (start, end) in enumerate(timestamps):
-            output_path = os.path.join(output_dir, f"{video_name}_clip_{i+1}.mp4")
-
-            try:
-                # Use ffmpeg to extract clip
-                cmd = [
-                    'ffmpeg',
-                    '-i', video_path,
-                    '-ss', str(start),
-                    '-to', str(end),
-                    '-c', 'copy',  # Copy codec (fast, no re-encoding)
-                    '-y',  # Overwrite output
-                    output_path
-                ]
-
-                logger.info(f"Extracting clip {i+1}: {start:.2f}s - {end:.2f}s")
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-
-                if result.returncode == 0:
-                    clip_paths.append(output_path)
-                    logger.info(f"Clip saved: {output_path}")
-                else:
-                    logger.error(f"ffmpeg failed: {result.stderr}")
+        if not batch_ok:
+            # A failed or killed run can leave truncated MP4s (no moov atom):
+            # discard them all and redo every clip on its own
+            _remove_outputs()
 
-            except subprocess.TimeoutExpired:
-                logger.error(f"ffmpeg timeout for clip {i+1}")
-            except Exception as e:
-                logger.error(f"Failed to extract clip {i+1}: {e}")
+        clip_paths = []
+        for i, ((start, end), output_path) in enumerate(zip(timestamps, outputs)):
+            if batch_ok and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                clip_paths.append(output_path)
+                logger.info(f"Clip saved: {output_path}")
+            elif self._extract_clip(video_path, i, start, end, output_path):
+                clip_paths.append(output_path)
 
         return clip_paths
 
+    def _extract_clip(self, video_path: str, i: int, start: float, end: float,
+                      output_path: str) -> bool:
+        """Extract a single clip (fallback path for extract_clips)."""
+        try:
+            # Use ffmpeg to extract clip
+            cmd = [
+                *_FFMPEG,
+                '-i', video_path,
+                '-ss', str(start),
+                '-to', str(end),
+                '-c', 'copy',  # Copy codec (fast, no re-encoding)
+                '-y',  # Overwrite output
+                output_path
+            ]
+
+            logger.info(f"Extracting clip {i+1}: {start:.2f}s - {end:.2f}s")
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=60
+            )
+
+            if result.returncode == 0:
+                logger.info(f"Clip saved: {output_path}")
+                return True
+            logger.error(f"ffmpeg failed: {result.stderr}")
+
+        except subprocess.TimeoutExpired:
+            logger.error(f"ffmpeg timeout for clip {i+1}")
+        except Exception as e:
+            logger.error(f"Failed to extract clip {i+1}: {e}")
+        return False
+
     def _parse_timestamps(self, timestamps_str: str) -> List[Tuple[float, float]]:
         """Parse timestamp string to list of (start, end) tuples.
 
@@ -219,23 +329,10 @@ class VidiClient:
         Returns:
             List of (start_seconds, end_seconds) tuples
         """
-        timestamps = []
-
-        # Pattern: HH:MM:SS or HH:MM:SS.ss
-        time_pattern = r'(\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)'
-        range_pattern = f'{time_pattern}-{time_pattern}'
-
-        matches = re.finditer(range_pattern, timestamps_str)
-
-        for match in matches:
-            # Start time
-            start_h, start_m, start_s = match.groups()[:3]
-            start_seconds = int(start_h) * 3600 + int(start_m) * 60 + float(start_s)
-
-            # End time
-            end_h, end_m, end_s = match.groups()[3:]
-            end_seconds = int(end_h) * 3600 + int(end_m) * 60 + float(end_s)
-
-            timestamps.append((start_seconds, end_seconds))
-
-        return timestamps
+        # findall hands back group tuples directly (no Match objects)
+        return [
+            (int(start_h) * 3600 + int(start_m) * 60 + float(start_s),
+             int(end_h) * 3600 + int(end_m) * 60 + float(end_s))
+            for start_h, start_m, start_s, end_h, end_m, end_s
+            in _TIMESTAMP_RANGE_RE.findall(timestamps_str)
+        ]
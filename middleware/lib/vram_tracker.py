@@ -11,8 +11,14 @@ Usage:
     if tracker.can_fit(20000):
         print("Can start ComfyUI")
 """
+import atexit
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 
 # Try to import pynvml, but handle gracefully if not available (e.g., in Docker without GPU access)
@@ -24,8 +30,65 @@ except ImportError:
     PYNVML_AVAILABLE = False
     logger.warning("pynvml not available - GPU monitoring disabled")
 
+# NVML is initialised once per process and shut down at exit: nvmlInit /
+# nvmlShutdown cost tens of ms, too much to pay on every status poll
+_nvml_lock = threading.Lock()
+_nvml_initialized = False
+_nvml_handles: Dict[int, object] = {}
+# Async callers run NVML queries here: off the event loop, and always on
+# the same OS thread (NVML calls are blocking and thread-sensitive)
+NVML_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nvml")
 
-@dataclass
+# nvmlDeviceGetMemoryInfo_v2 support; cleared on first failure (older drivers)
+_memory_v2 = PYNVML_AVAILABLE and hasattr(pynvml, "nvmlMemory_v2")
+
+
+def _get_memory_info(handle):
+    """nvmlDeviceGetMemoryInfo, preferring the v2 struct when supported."""
+    global _memory_v2
+    if _memory_v2:
+        try:
+            return pynvml.nvmlDeviceGetMemoryInfo(handle, version=pynvml.nvmlMemory_v2)
+        except pynvml.NVMLError as e:
+            logger.debug(f"nvmlDeviceGetMemoryInfo_v2 unavailable, using v1: {e}")
+            _memory_v2 = False
+    return pynvml.nvmlDeviceGetMemoryInfo(handle)
+
+
+def _get_nvml_handle(device_index: int):
+    """Get the process-wide NVML device handle, initialising NVML once."""
+    global _nvml_initialized
+    handle = _nvml_handles.get(device_index)
+    if handle is not None:
+        return handle
+
+    with _nvml_lock:
+        if device_index not in _nvml_handles:
+            if not _nvml_initialized:
+                pynvml.nvmlInit()
+                _nvml_initialized = True
+                atexit.register(_nvml_shutdown)
+            _nvml_handles[device_index] = pynvml.nvmlDeviceGetHandleByIndex(device_index)
+        return _nvml_handles[device_index]
+
+
+def _nvml_shutdown():
+    """Release NVML (atexit, or VRAMTracker.shutdown(force=True))."""
+    global _nvml_initialized
+    with _nvml_lock:
+        if not _nvml_initialized:
+            return
+        _nvml_initialized = False
+        _nvml_handles.clear()
+        try:
+            pynvml.nvmlShutdown()
+            logger.debug("NVML shutdown complete")
+        except Exception as e:
+            logger.warning(f"NVML shutdown error: {e}")
+
+
+# Slotted and frozen: built on every poll, and cached samples are shared
+@dataclass(slots=True, frozen=True)
 class GPUProcess:
     """A process using GPU memory."""
     pid: int
@@ -33,7 +96,7 @@ class GPUProcess:
     memory_mb: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class VRAMStatus:
     """Current GPU memory status."""
     total_mb: int
@@ -44,6 +107,58 @@ class VRAMStatus:
     utilization_percent: Optional[int] = None
 
 
+# Inode of the initial (host) PID namespace, PROC_PID_INIT_INO in the kernel
+_HOST_PID_NS_INO = 0xEFFFFFFC
+
+
+def _in_host_pid_namespace() -> bool:
+    """True if our /proc shows host PIDs, the PIDs NVML reports."""
+    try:
+        return os.stat("/proc/self/ns/pid").st_ino == _HOST_PID_NS_INO
+    except OSError:
+        return False
+
+
+# Inside a container (e.g. mcn_core) /proc/<host pid> is another process
+# or none at all, so names then come from NVML only
+_PROC_NAMES = _in_host_pid_namespace()
+
+
+@functools.lru_cache(maxsize=256)
+def _read_comm(pid: int, started_ns: int) -> Optional[str]:
+    """Read /proc/<pid>/comm; cached per process incarnation (pid + start)."""
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _get_process_name(pid: int) -> str:
+    """
+    Name a GPU process, preferring /proc over an NVML round trip.
+
+    /proc is only used in the host PID namespace (see _PROC_NAMES); in a
+    container, or when the PID is not in /proc, nvmlSystemGetProcessName
+    names it.
+    """
+    if _PROC_NAMES:
+        try:
+            # /proc/<pid> is created at process start: its ctime tells a
+            # reused PID apart from the process we cached
+            name = _read_comm(pid, os.stat(f"/proc/{pid}").st_ctime_ns)
+            if name:
+                return name
+        except OSError:
+            pass
+
+    try:
+        name = pynvml.nvmlSystemGetProcessName(pid)
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+    except Exception:
+        return f"pid_{pid}"
+
+
 class VRAMTracker:
     """
     Track GPU VRAM usage in real-time using pynvml.
@@ -51,10 +166,22 @@ class VRAMTracker:
     Thread-safe singleton pattern recommended via get_vram_tracker().
     """
 
+    # can_fit() decides from a cached sample up to BAND_MAX_AGE_S old when
+    # the answer is clear by more than BAND_MB; borderline checks re-poll
+    BAND_MB = 2048
+    BAND_MAX_AGE_S = 5.0
+
     def __init__(self, device_index: int = 0):
         self.device_index = device_index
         self._initialized = False
         self._handle = None
+        self._total_mb: Optional[int] = None  # Static for the process lifetime
+        # Burst callers within the TTL share one NVML sample
+        self._ttl = float(os.getenv("VRAM_POLL_TTL_MS", "500")) / 1000
+        self._cache: Optional[VRAMStatus] = None
+        self._cache_ts = 0.0
+        self._cache_has_processes = False
+        self._cache_lock = threading.Lock()
 
     def _ensure_init(self):
         """Lazy initialization of NVML."""
@@ -66,8 +193,8 @@ class VRAMTracker:
                 return
 
             try:
-                pynvml.nvmlInit()
-                self._handle = pynvml.nvmlDeviceGetHandleByIndex(self.device_index)
+                self._handle = _get_nvml_handle(self.device_index)
+                self._total_mb = _get_memory_info(self._handle).total >> 20
                 self._initialized = True
                 logger.debug("NVML initialized successfully")
             except Exception as e:
@@ -75,13 +202,64 @@ class VRAMTracker:
                 self._initialized = True
                 self._handle = None
 
-    def get_status(self) -> VRAMStatus:
+    def _cached(self, include_processes: bool) -> Optional[VRAMStatus]:
+        """Return the cached sample if fresh and detailed enough."""
+        status = self._cache
+        if (status is not None
+                and time.monotonic() - self._cache_ts < self._ttl
+                and (self._cache_has_processes or not include_processes)):
+            return status
+        return None
+
+    def get_status(self, include_processes: bool = True) -> VRAMStatus:
         """
         Get current VRAM status.
 
+        Samples younger than VRAM_POLL_TTL_MS (default 500ms) are reused,
+        so concurrent /health, /gpu/status and can_fit() calls share one
+        set of NVML queries.
+
+        Args:
+            include_processes: Resolve per-process usage and names (one
+                NVML call per GPU process); processes is [] when False
+
         Returns:
             VRAMStatus with total, used, free memory and process list
         """
+        status = self._cached(include_processes)
+        if status is not None:
+            return status
+
+        with self._cache_lock:
+            # Another caller may have refreshed while we waited
+            status = self._cached(include_processes)
+            if status is not None:
+                return status
+            status = self._read_status(include_processes)
+            self._cache = status
+            self._cache_ts = time.monotonic()
+            self._cache_has_processes = include_processes
+            return status
+
+    def get_memory(self) -> Tuple[int, int, int]:
+        """
+        Get (total_mb, used_mb, free_mb) with a single NVML call.
+
+        Cheap path for scheduling decisions: no process, temperature or
+        utilization queries. Reuses a fresh get_status() sample if any.
+        """
+        status = self._cached(include_processes=False)
+        if status is not None:
+            return status.total_mb, status.used_mb, status.free_mb
+
+        self._ensure_init()
+        if self._handle is None:
+            return 24576, 0, 24576  # Fallback mode (RTX 4090 default)
+
+        return (self._total_mb, *self._read_memory())
+
+    def _read_status(self, include_processes: bool = True) -> VRAMStatus:
+        """Query NVML for a fresh VRAMStatus."""
         self._ensure_init()
 
         # Fallback mode when NVML is not available
@@ -96,30 +274,11 @@ class VRAMTracker:
             )
 
         # Memory info
-        mem_info = pynvml.nvmlDeviceGetMemoryInfo(self._handle)
-        total_mb = mem_info.total // (1024 * 1024)
-        used_mb = mem_info.used // (1024 * 1024)
-        free_mb = mem_info.free // (1024 * 1024)
+        total_mb = self._total_mb
+        used_mb, free_mb = self._read_memory()
 
         # Process info
-        processes = []
-        try:
-            procs = pynvml.nvmlDeviceGetComputeRunningProcesses(self._handle)
-            for p in procs:
-                try:
-                    name = pynvml.nvmlSystemGetProcessName(p.pid)
-                    if isinstance(name, bytes):
-                        name = name.decode('utf-8')
-                except Exception:
-                    name = f"pid_{p.pid}"
-
-                processes.append(GPUProcess(
-                    pid=p.pid,
-                    name=name,
-                    memory_mb=(p.usedGpuMemory or 0) // (1024 * 1024)
-                ))
-        except pynvml.NVMLError as e:
-            logger.warning(f"Could not get GPU processes: {e}")
+        processes = self._read_processes() if include_processes else []
 
         # Temperature and utilization (optional)
         temp = None
@@ -142,48 +301,100 @@ class VRAMTracker:
             utilization_percent=util_percent
         )
 
-    def can_fit(self, required_mb: int, safety_margin_mb: int = 1024) -> bool:
+    def _read_memory(self) -> Tuple[int, int]:
+        """
+        Read (used_mb, free_mb) with one NVML call.
+
+        used is derived as total - free: v2's `used` excludes driver-reserved
+        memory, and this keeps the v1 meaning whichever struct is returned.
+        """
+        mem_info = _get_memory_info(self._handle)
+        return (mem_info.total - mem_info.free) >> 20, mem_info.free >> 20
+
+    def _read_processes(self) -> List[GPUProcess]:
+        """List compute processes on the device with their VRAM usage."""
+        processes = []
+        try:
+            procs = pynvml.nvmlDeviceGetComputeRunningProcesses(self._handle)
+            for p in procs:
+                processes.append(GPUProcess(
+                    pid=p.pid,
+                    name=_get_process_name(p.pid),
+                    memory_mb=(p.usedGpuMemory or 0) >> 20
+                ))
+        except pynvml.NVMLError as e:
+            logger.warning(f"Could not get GPU processes: {e}")
+        return processes
+
+    def can_fit(
+        self,
+        required_mb: int,
+        safety_margin_mb: int = 1024,
+        status: Optional[VRAMStatus] = None
+    ) -> bool:
         """
         Check if required VRAM can fit with safety margin.
 
         Args:
             required_mb: Required VRAM in MB
             safety_margin_mb: Extra headroom (default 1GB for system)
+            status: Snapshot to decide against, so several checks in one
+                scheduling tick share a reading (default: a recent cached
+                sample if it is outside BAND_MB of the threshold, else
+                read memory now)
 
         Returns:
             True if there's enough free VRAM
         """
-        status = self.get_status()
-        available = status.free_mb - safety_margin_mb
+        if status is None:
+            cached = self._cache
+            if (cached is not None
+                    and time.monotonic() - self._cache_ts < self.BAND_MAX_AGE_S
+                    and abs(cached.free_mb - safety_margin_mb - required_mb) > self.BAND_MB):
+                status = cached
+
+        free_mb = status.free_mb if status is not None else self.get_memory()[2]
+        available = free_mb - safety_margin_mb
         can_fit = available >= required_mb
 
+        # Loguru only formats the args if DEBUG is enabled (hot scheduler path)
         logger.debug(
-            f"VRAM check: need {required_mb} MB, "
-            f"have {available} MB (free={status.free_mb}, margin={safety_margin_mb})"
+            "VRAM check: need {} MB, have {} MB (free={}, margin={})",
+            required_mb, available, free_mb, safety_margin_mb
         )
         return can_fit
 
     def get_process_by_name(self, name_pattern: str) -> Optional[GPUProcess]:
-        """Find a GPU process by name pattern."""
-        status = self.get_status()
-        for proc in status.processes:
-            if name_pattern.lower() in proc.name.lower():
-                return proc
-        return None
+        """Find a GPU process by name pattern (case-insensitive substring)."""
+        pattern = name_pattern.lower()
+        # get_status() serves the TTL-cached sample to back-to-back lookups
+        return next(
+            (proc for proc in self.get_status().processes if pattern in proc.name.lower()),
+            None
+        )
 
-    def shutdown(self):
-        """Clean up NVML resources."""
-        if self._initialized:
-            try:
-                pynvml.nvmlShutdown()
-                self._initialized = False
-                logger.debug("NVML shutdown complete")
-            except pynvml.NVMLError as e:
-                logger.warning(f"NVML shutdown error: {e}")
+    def shutdown(self, force: bool = False):
+        """
+        Clean up NVML resources.
+
+        NVML stays initialised for the whole process (released at exit), so
+        this is a no-op unless force=True, e.g. in tests.
+
+        Args:
+            force: Really call nvmlShutdown for every tracker in the process
+        """
+        if not force:
+            logger.debug("NVML kept initialised until process exit")
+            return
+
+        _nvml_shutdown()
+        self._initialized = False
+        self._handle = None
 
 
 # Singleton instance
 _tracker: Optional[VRAMTracker] = None
+_tracker_lock = threading.Lock()
 
 
 def get_vram_tracker(device_index: int = 0) -> VRAMTracker:
@@ -198,5 +409,8 @@ def get_vram_tracker(device_index: int = 0) -> VRAMTracker:
     """
     global _tracker
     if _tracker is None:
-        _tracker = VRAMTracker(device_index)
+        # Double-checked: concurrent first calls build one tracker
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = VRAMTracker(device_index)
     return _tracker
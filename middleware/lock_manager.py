@@ -1,53 +1,179 @@
 import redis
 import time
 import logging
+from typing import Callable, Optional, Tuple
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("LockManager")
 
+# Take the token only if it is free AND nobody is waiting (queues and
+# in-flight list empty), so a new arrival never jumps the line; otherwise
+# queue the task. Returns 0 when granted, else the task's 1-based position
+# in grant order (in-flight, then high queue, then low queue).
+# KEYS: token, high queue, low queue, inflight; ARGV: task_id, ttl_ms, 'high'/'low'
+ACQUIRE_SCRIPT = """
+local high = redis.call('LLEN', KEYS[2])
+local low = redis.call('LLEN', KEYS[3])
+local inflight = redis.call('LLEN', KEYS[4])
+if high + low + inflight == 0 and redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 0
+end
+if ARGV[3] == 'high' then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+    return inflight + 1
+end
+return inflight + high + redis.call('RPUSH', KEYS[3], ARGV[1])
+"""
+
+UNLOCK_CHANNEL = "gpu:unlock"    # Published on release (payload: task id)
+GRANT_CHANNEL = "gpu:granted"    # Published by the scheduler (payload: task id)
+INFLIGHT_KEY = "gpu_inflight"    # Tasks dequeued but not yet granted
+
+# Compare-and-delete: only the owner may release the token
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 class GPULockManager:
     def __init__(self, redis_host='localhost', redis_port=6379, db=0):
         self.r = redis.Redis(host=redis_host, port=redis_port, db=db, decode_responses=True)
         self.QUEUE_HIGH = "gpu_queue_high"
         self.QUEUE_LOW = "gpu_queue_low"
         self.GPU_TOKEN_KEY = "gpu_active_token"
+        self._acquire_script = self.r.register_script(ACQUIRE_SCRIPT)
+        self._release_script = self.r.register_script(RELEASE_SCRIPT)
         
         # Ensure token key exists (reset on init if needed, or handle manually)
         # In a real system, we might not want to reset on every restart.
         
-    def acquire_lock(self, priority: int, task_id: str, timeout: int = 60) -> bool:
+    def acquire_lock(self, priority: int, task_id: str, timeout: int = 60) -> int:
         """
         Attempt to acquire the GPU lock.
-        If priority >= 100, attempts to jump queue or preempt (logic simplified for now).
+        
+        One Lua round trip: if the GPU token is free and no task is waiting,
+        take it (expiring after `timeout` seconds for safety); otherwise
+        queue the task, with priority >= 100 at the front of the high queue.
+        Queued tasks are granted by run_scheduler_loop (see wait_for_lock).
+        
+        Returns:
+            0 if the token was granted, else the task's 1-based queue position
         """
         logger.info(f"Task {task_id} requesting lock with priority {priority}...")
         
-        # 1. Check if GPU is free
-        # Simple Mutex implementation using Redis 'setnx' with expiry for safety
-        # But we need a QUEUE system as per requirements.
+        position = self._acquire_script(
+            keys=[self.GPU_TOKEN_KEY, self.QUEUE_HIGH, self.QUEUE_LOW, INFLIGHT_KEY],
+            args=[task_id, timeout * 1000, 'high' if priority >= 100 else 'low']
+        )
+        if position:
+            logger.info(f"Task {task_id} queued at position {position}")
+        return int(position)
+
+    def release_lock(self, task_id: str) -> bool:
+        """
+        Release the GPU lock, only if task_id still owns it.
         
-        # Add to appropriate list
-        if priority >= 100:
-            self.r.lpush(self.QUEUE_HIGH, task_id) # High prio goes to front? Or separate queue? 
-            # Separate queue is better for explicit "Speed 2" logic.
-        else:
-            self.r.rpush(self.QUEUE_LOW, task_id)
-            
-        # 2. Blocking Wait for Token
-        # This part needs a worker to process? 
-        # Or does the client block?
-        # "Middleware Service" should handle the blocking.
+        Returns:
+            True if the token was released
+        """
+        logger.info(f"Task {task_id} releasing lock...")
+        released = self._release_script(keys=[self.GPU_TOKEN_KEY], args=[task_id])
+        if not released:
+            logger.warning(f"Task {task_id} does not hold the GPU lock")
+            return False
         
-        # FOR PHASE 3.1 (Basic Unit):
-        # We will implement a simple 'try_acquire' that the API usage loop calls.
+        # Wake the scheduler instead of letting it poll the token
+        self.r.publish(UNLOCK_CHANNEL, task_id)
+        return True
+
+    def next_task(self, timeout: float = 1.0) -> Optional[Tuple[str, str]]:
+        """
+        Move the next queued task onto INFLIGHT_KEY, blocking up to timeout.
         
-        # Real logic:
-        # The Scheduler (Worker) pops from High, then Low.
-        # If item found, it 'grants' the lock.
+        The high queue is checked first; the wait itself blocks on the low
+        queue, so a high-priority arrival is seen within one timeout.
         
-        return True
+        Returns:
+            (source_queue, task_id), or None if nothing arrived
+        """
+        task_id = self.r.lmove(self.QUEUE_HIGH, INFLIGHT_KEY, "LEFT", "RIGHT")
+        if task_id is not None:
+            return self.QUEUE_HIGH, task_id
+        
+        task_id = self.r.blmove(self.QUEUE_LOW, INFLIGHT_KEY, timeout, "LEFT", "RIGHT")
+        if task_id is not None:
+            return self.QUEUE_LOW, task_id
+        return None
 
-    def release_lock(self, task_id: str):
-        logger.info(f"Task {task_id} releasing lock...")
-        self.r.delete(self.GPU_TOKEN_KEY)
+    def run_scheduler_loop(
+        self,
+        on_grant: Optional[Callable[[str], None]] = None,
+        lock_ttl: int = 60,
+        should_stop: Callable[[], bool] = lambda: False
+    ):
+        """
+        Grant the GPU token to queued tasks, one at a time.
+        
+        Sleeps on the UNLOCK_CHANNEL subscription while the token is held
+        and on a blocking dequeue while the queues are empty, so nothing
+        spins against Redis. Each grant is published on GRANT_CHANNEL.
+        
+        Args:
+            on_grant: Called with the task id after each grant
+            lock_ttl: Token expiry in seconds (safety net for crashed tasks)
+            should_stop: Checked between iterations to end the loop
+        """
+        pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(UNLOCK_CHANNEL)
+        logger.info("GPU scheduler loop started")
+        
+        try:
+            while not should_stop():
+                if self.r.exists(self.GPU_TOKEN_KEY):
+                    # Held: wait for a release (re-check periodically for TTL expiry)
+                    pubsub.get_message(timeout=1.0)
+                    continue
+                
+                item = self.next_task(timeout=1.0)
+                if item is None:
+                    continue
+                
+                queue_key, task_id = item
+                if self.r.set(self.GPU_TOKEN_KEY, task_id, nx=True, px=lock_ttl * 1000):
+                    self.r.lrem(INFLIGHT_KEY, 1, task_id)
+                    self.r.publish(GRANT_CHANNEL, task_id)
+                    logger.info(f"Granted GPU lock to {task_id}")
+                    if on_grant:
+                        on_grant(task_id)
+                else:
+                    # Taken directly by an acquire_lock that found the queues
+                    # empty while we were blocked on them: requeue at the front
+                    self.r.lmove(INFLIGHT_KEY, queue_key, "RIGHT", "LEFT")
+        finally:
+            pubsub.close()
+
+    def wait_for_lock(self, task_id: str, timeout: float = 60) -> bool:
+        """
+        Block until the scheduler grants the token to task_id.
+        
+        Returns:
+            True if granted within timeout
+        """
+        pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(GRANT_CHANNEL)
+        try:
+            # Subscribed before checking, so a grant in between is not missed
+            if self.r.get(self.GPU_TOKEN_KEY) == task_id:
+                return True
+            
+            deadline = time.monotonic() + timeout
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = pubsub.get_message(timeout=remaining)
+                if message and message["data"] == task_id:
+                    return True
+            return False
+        finally:
+            pubsub.close()
@@ -30,4 +30,9 @@ async def main():
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop  # Optional: faster event loop when installed
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
@@ -26,7 +26,7 @@ def main():
 
     print(f"\nCan fit tests:")
     for size in [4000, 10000, 18000, 20000, 22000]:
-        can_fit = tracker.can_fit(size)
+        can_fit = tracker.can_fit(size, status=status)
         emoji = "✓" if can_fit else "✗"
         print(f"  {emoji} {size:,} MB: {'YES' if can_fit else 'NO'}")
 
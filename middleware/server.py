@@ -1,6 +1,8 @@
 import os
+import orjson
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from dotenv import load_dotenv
@@ -15,7 +17,41 @@ from lib.gpu_manager_v2 import get_gpu_manager_v2
 # Test mode toggle - set FLOW1_TEST_MODE=true to enable test features
 FLOW1_TEST_MODE = os.getenv("FLOW1_TEST_MODE", "false").lower() == "true"
 
-app = FastAPI(title="MCN GPU Scheduler (Async)", version="2.0")
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson (multi-KB storyboards, CCOs)."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+app = FastAPI(
+    title="MCN GPU Scheduler (Async)",
+    version="2.0",
+    default_response_class=OrjsonResponse
+)
+
+
+@app.on_event("startup")
+async def warmup_query_engine():
+    """Load BettaFish/Tavily in the background so the first search is not cold."""
+    import asyncio
+    from lib.query_engine import warmup
+    asyncio.get_running_loop().run_in_executor(None, warmup)
+
+
+@app.on_event("shutdown")
+async def close_pooled_clients():
+    """Close keep-alive HTTP pools held by perception singletons."""
+    import sys
+    # Only touch modules that were actually loaded during this process
+    if "lib.qdrant_client" in sys.modules:
+        await sys.modules["lib.qdrant_client"].close_qdrant_client()
+    if "lib.perception_pipeline" in sys.modules:
+        await sys.modules["lib.perception_pipeline"].close_perception_pipeline()
+    await _OLLAMA_CLIENT.aclose()
+    await _ANTIGRAVITY_CLIENT.aclose()
+
 
 class JobRequest(BaseModel):
     task_type: str       # "comfyui" | "cosyvoice"
@@ -35,12 +71,7 @@ def submit_job(job: JobRequest):
     task_id = redis_client.enqueue_task(job.task_type, job.payload, job.priority)
     return {"status": "queued", "task_id": task_id}
 
-@app.get("/status/{task_id}")
-def check_status(task_id: str):
-    info = redis_client.get_task_info(task_id)
-    if not info:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
+def _status_response(info):
     response = {
         "id": info["id"],
         "status": info["status"],
@@ -55,12 +86,44 @@ def check_status(task_id: str):
         
     return response
 
+@app.get("/status/{task_id}")
+def check_status(task_id: str):
+    info = redis_client.get_task_info(task_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return _status_response(info)
+
+class StatusBatchRequest(BaseModel):
+    task_ids: List[str]
+
+@app.post("/status/batch")
+def check_status_batch(req: StatusBatchRequest):
+    """
+    Status of many tasks in one Redis round-trip.
+    Unknown ids map to null.
+    """
+    infos = redis_client.get_task_infos(req.task_ids)
+    return {
+        task_id: _status_response(info) if info else None
+        for task_id, info in infos.items()
+    }
+
+@app.get("/tasks")
+def list_tasks(status: Optional[str] = None, task_type: Optional[str] = None):
+    """
+    List tasks filtered by status and/or type (index sets, no key scan).
+    Without filters, lists every stored task.
+    """
+    infos = redis_client.find_tasks(status=status, task_type=task_type)
+    return {"count": len(infos), "tasks": [_status_response(info) for info in infos]}
+
 @app.get("/health")
 async def health_check():
     """Health check with GPU status."""
     try:
         manager = get_gpu_manager_v2()
-        vram = manager.get_vram_status()
+        vram = await manager.get_vram_status_async(include_processes=False)
         gpu_ok = vram.free_mb > 1000  # At least 1GB free
         gpu_info = {
             "ok": gpu_ok,
@@ -128,7 +191,7 @@ async def start_gpu_service(service_name: str):
         Success status
     """
     manager = get_gpu_manager_v2()
-    if service_name not in manager.services:
+    if service_name not in manager.service_names:
         raise HTTPException(404, f"Unknown service: {service_name}")
 
     success = await manager.lifecycle.ensure_service(service_name)
@@ -148,7 +211,7 @@ async def stop_gpu_service(service_name: str, force: bool = False):
         Success status
     """
     manager = get_gpu_manager_v2()
-    if service_name not in manager.services:
+    if service_name not in manager.service_names:
         raise HTTPException(404, f"Unknown service: {service_name}")
 
     success = await manager.lifecycle.stop_service(service_name, force)
@@ -192,8 +255,15 @@ class SanityWebhookPayload(BaseModel):
     status: Optional[str] = None
     title: Optional[str] = None
 
-@app.post("/webhook/sanity")
-async def handle_sanity_webhook(payload: SanityWebhookPayload):
+# SanityWebhookPayload documents the body in OpenAPI; the handler reads the
+# raw dict so each event skips pydantic alias resolution and extra-field capture
+@app.post(
+    "/webhook/sanity",
+    openapi_extra={"requestBody": {"content": {"application/json": {
+        "schema": SanityWebhookPayload.model_json_schema(by_alias=True)
+    }}}}
+)
+async def handle_sanity_webhook(payload: Dict[str, Any] = Body(...)):
     """
     Receives webhook notifications from Sanity CMS.
     
@@ -203,9 +273,11 @@ async def handle_sanity_webhook(payload: SanityWebhookPayload):
     - Filter: _type == "post"
     - Projection: {_id, _type, status, title, artist}
     """
-    doc_type = payload.doc_type
-    doc_id = payload.doc_id
-    status = payload.status
+    doc_id = payload.get("_id")
+    doc_type = payload.get("_type")
+    status = payload.get("status")
+    if not isinstance(doc_id, str) or not isinstance(doc_type, str):
+        raise HTTPException(status_code=422, detail="Sanity payload requires string _id and _type")
     
     logger.info(f"📨 Sanity Webhook: {doc_type} [{doc_id}] -> status={status}")
     
@@ -290,7 +362,53 @@ async def get_production_status(post_id: str):
 # Creative Flow Endpoints
 # =============================================
 import os
+import re
 import httpx
+import orjson
+
+# Shared keep-alive client for the Ollama/OpenAI-compatible endpoint
+_OLLAMA_CLIENT = httpx.AsyncClient(
+    base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1"),
+    timeout=120.0
+)
+
+# First fenced block in an LLM reply, with or without a json tag
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)
+# First fenced block holding a JSON object (skips prose/code fences)
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+
+
+def _strip_code_fence(content: str) -> str:
+    """Return the body of the first ``` fenced block, or content unchanged."""
+    match = _FENCE_RE.search(content)
+    return match.group(1) if match else content
+
+
+# "scene*" keys that are not mistyped scene_type keys
+_KNOWN_SCENE_KEYS = frozenset({"scene_number", "scene_type"})
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "prompts")
+_prompt_cache: Dict[str, tuple] = {}  # name -> (mtime_ns, text)
+
+
+def _load_prompt(name: str, default: str) -> str:
+    """
+    Read prompts/<name>.md once, re-reading only after the file changes.
+    Returns default if the file does not exist.
+    """
+    path = os.path.join(PROMPTS_DIR, f"{name}.md")
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return default
+    
+    cached = _prompt_cache.get(name)
+    if cached is None or cached[0] != mtime_ns:
+        with open(path, "r") as f:
+            cached = (mtime_ns, f.read())
+        _prompt_cache[name] = cached
+    return cached[1]
+
 
 class AnalyzeRequest(BaseModel):
     content: str
@@ -313,44 +431,37 @@ async def analyze_content(req: AnalyzeRequest):
     Returns structured JSON with topic, key_points, angle, etc.
     """
     # Load analyst prompt
-    prompt_path = os.path.join(os.path.dirname(__file__), "..", "prompts", "analyst.md")
-    try:
-        with open(prompt_path, "r") as f:
-            system_prompt = f.read()
-    except FileNotFoundError:
-        system_prompt = "You are an AI analyst. Summarize the content into topic, key_points, and angle as JSON."
+    system_prompt = _load_prompt(
+        "analyst",
+        "You are an AI analyst. Summarize the content into topic, key_points, and angle as JSON."
+    )
     
     # Call Ollama/OpenAI compatible endpoint
-    ollama_url = os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1")
     model = os.getenv("OPENAI_MODEL_NAME", "qwen3:8b")
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{ollama_url}/chat/completions",
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this content:\n\n{req.content[:4000]}"}
-                ],
-                "temperature": 0.3
-            }
-        )
-        result = response.json()
+    response = await _OLLAMA_CLIENT.post(
+        "/chat/completions",
+        json={
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Analyze this content:\n\n{req.content[:4000]}"}
+            ],
+            "temperature": 0.3
+        },
+        timeout=60.0
+    )
+    result = orjson.loads(response.content)
     
     # Extract content
     content = result.get("choices", [{}])[0].get("message", {}).get("content", "{}")
     
     # Try to parse as JSON
-    import json
     try:
         # Remove any markdown code blocks
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        analysis = json.loads(content.strip())
-    except json.JSONDecodeError:
+        content = _strip_code_fence(content)
+        analysis = orjson.loads(content.strip())
+    except orjson.JSONDecodeError:
         analysis = {"raw": content, "error": "Failed to parse JSON"}
     
     return {"status": "success", "analysis": analysis}
@@ -362,54 +473,49 @@ async def generate_storyboard(req: ScreenwriteRequest):
     Returns scenes array matching scene.ts schema.
     """
     # Load screenwriter prompt
-    prompt_path = os.path.join(os.path.dirname(__file__), "..", "prompts", "screenwriter.md")
-    try:
-        with open(prompt_path, "r") as f:
-            system_prompt = f.read()
-    except FileNotFoundError:
-        system_prompt = "You are a screenwriter. Create a storyboard with scenes array."
+    system_prompt = _load_prompt(
+        "screenwriter",
+        "You are a screenwriter. Create a storyboard with scenes array."
+    )
     
-    ollama_url = os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1")
     model = os.getenv("OPENAI_MODEL_NAME", "qwen3:8b")
     
-    import json
-    user_message = f"Create a storyboard for this analysis:\n\n{json.dumps(req.analysis, ensure_ascii=False)}"
-    
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{ollama_url}/chat/completions",
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                "temperature": 0.5
-            }
-        )
-        result = response.json()
+    user_message = f"Create a storyboard for this analysis:\n\n{orjson.dumps(req.analysis).decode()}"
+    
+    response = await _OLLAMA_CLIENT.post(
+        "/chat/completions",
+        json={
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "temperature": 0.5
+        }
+    )
+    result = orjson.loads(response.content)
     
     content = result.get("choices", [{}])[0].get("message", {}).get("content", "{}")
     
     # Parse and validate
     try:
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        storyboard = json.loads(content.strip())
+        content = _strip_code_fence(content)
+        storyboard = orjson.loads(content.strip())
         
         # Fix common LLM typos in scene objects
-        if "scenes" in storyboard:
-            for scene in storyboard["scenes"]:
-                # Fix typos like "scene," -> "scene_type"
-                typo_keys = [k for k in scene.keys() if k.startswith("scene") and k != "scene_number" and k != "scene_type"]
-                for typo in typo_keys:
-                    if "scene_type" not in scene:
-                        scene["scene_type"] = scene.pop(typo)
+        for scene in storyboard.get("scenes", ()):
+            if "scene_type" in scene:
+                continue
+            # Fix typos like "scene," -> "scene_type"
+            typo = next(
+                (k for k in scene if k.startswith("scene") and k not in _KNOWN_SCENE_KEYS),
+                None
+            )
+            if typo is not None:
+                scene["scene_type"] = scene.pop(typo)
+            else:
                 # Fix missing scene_type - default to a_roll if has script
-                if "scene_type" not in scene:
-                    scene["scene_type"] = "a_roll" if scene.get("script") else "b_roll"
+                scene["scene_type"] = "a_roll" if scene.get("script") else "b_roll"
         
         # Validate with our validator
         from lib.validators import Storyboard
@@ -720,6 +826,13 @@ async def pipeline_status():
 # BettaFish Integration (SENSE Layer)
 # =============================================
 
+# Shared keep-alive client for Antigravity (Gemini via OpenAI-compatible API)
+_ANTIGRAVITY_CLIENT = httpx.AsyncClient(
+    base_url=os.getenv("ANTIGRAVITY_BASE_URL", "http://127.0.0.1:8045/v1"),
+    timeout=120.0,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+)
+
 class GenerateScriptRequest(BaseModel):
     """Request for CCO-based script generation."""
     topic_id: str
@@ -730,6 +843,7 @@ class GenerateScriptRequest(BaseModel):
     additional_context: Optional[str] = None
     create_post: bool = False
     artist_id: Optional[str] = None
+    use_cache: bool = True  # False forces a fresh Gemini generation
 
 
 def format_cco_to_prompt(cco: Dict[str, Any], persona: str, style: str) -> str:
@@ -805,7 +919,38 @@ Return a JSON storyboard with:
 # =============================================
 # MediaCrawlerPro Cookie Health Check
 # =============================================
-from lib.cookie_validator import validate_all_cookies, validate_platform_cookie, PLATFORMS
+from lib.cookie_validator import validate_platform_cookie, PLATFORMS
+
+COOKIE_CHECK_CONCURRENCY = 7  # One in flight per platform
+
+
+async def validate_cookies_concurrently(platforms: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Concurrent counterpart of lib.cookie_validator.validate_all_cookies:
+    wall time is the slowest platform, not the sum of all of them.
+    
+    Args:
+        platforms: Platform codes to check (None = all PLATFORMS)
+    
+    Returns:
+        One validation result per platform, in order; a platform whose
+        check raised is reported as is_valid=False with the error
+    """
+    import asyncio
+    
+    semaphore = asyncio.Semaphore(COOKIE_CHECK_CONCURRENCY)
+    
+    async def check(platform: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await validate_platform_cookie(platform)
+            except Exception as e:
+                logger.error(f"Cookie validation failed for {platform}: {e}")
+                return {"platform": platform, "is_valid": False, "error": str(e)}
+    
+    targets = list(PLATFORMS) if platforms is None else platforms
+    return await asyncio.gather(*(check(p) for p in targets))
+
 
 @app.get("/mediacrawler/check-cookies")
 async def check_all_cookies(platforms: Optional[str] = None):
@@ -822,8 +967,13 @@ async def check_all_cookies(platforms: Optional[str] = None):
     target_platforms = None
     if platforms:
         target_platforms = [p.strip() for p in platforms.split(",") if p.strip() in PLATFORMS]
+        if not target_platforms:
+            raise HTTPException(
+                status_code=400,
+                detail=f"No known platforms in '{platforms}' (expected: {', '.join(PLATFORMS)})"
+            )
     
-    results = await validate_all_cookies(platforms=target_platforms)
+    results = await validate_cookies_concurrently(platforms=target_platforms)
     
     valid_count = sum(1 for r in results if r["is_valid"])
     
@@ -918,8 +1068,9 @@ async def generate_script_from_topic(req: GenerateScriptRequest):
     Full SENSE → THINK flow:
     1. Get CCO from BettaFish (SENSE)
     2. Format CCO to rich prompt
-    3. Generate script with Gemini (THINK)
-    4. Optionally create Sanity post (CREATE)
+    3. Reuse a cached storyboard for the same or a near-identical prompt
+    4. Otherwise generate script with Gemini (THINK)
+    5. Optionally create Sanity post (CREATE)
     """
     from lib.bettafish_client import BettaFishClient
     from lib.gemini_client import get_gemini_client
@@ -939,17 +1090,37 @@ async def generate_script_from_topic(req: GenerateScriptRequest):
     if req.additional_context:
         prompt += f"\n\n## ADDITIONAL CONTEXT\n{req.additional_context}"
     
-    # 3. Generate script with Gemini (THINK)
-    try:
-        gemini = get_gemini_client()
-        
-        # Use Gemini for script generation
-        import httpx
-        antigravity_url = os.getenv("ANTIGRAVITY_BASE_URL", "http://127.0.0.1:8045/v1")
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{antigravity_url}/chat/completions",
+    # 3. Reuse a cached storyboard (exact request, then similar prompt)
+    import asyncio
+    from lib.script_cache import get_script_cache
+    from lib.qdrant_client import get_qdrant_client
+    
+    cache = get_script_cache()
+    cache_key = cache.make_key(req.topic_id, req.platform, req.persona, req.style, req.additional_context)
+    cache_scope = cache.make_scope(req.topic_id, req.platform, req.persona, req.style)
+    storyboard = None
+    embedding = None
+    
+    if req.use_cache:
+        try:
+            storyboard = await asyncio.to_thread(cache.get, cache_key)
+            if storyboard is None:
+                embedding = await get_qdrant_client().get_embedding(prompt)
+                if embedding:
+                    storyboard = await asyncio.to_thread(cache.find_similar, cache_scope, embedding)
+        except Exception as e:
+            logger.warning(f"Script cache lookup failed: {e}")
+    
+    if storyboard is not None:
+        logger.info(f"♻️ Script cache hit for {req.platform}/{req.topic_id}")
+    else:
+        # 4. Generate script with Gemini (THINK)
+        try:
+            gemini = get_gemini_client()
+            
+            # Use Gemini for script generation
+            response = await _ANTIGRAVITY_CLIENT.post(
+                "/chat/completions",
                 json={
                     "model": "gemini-3-pro-high",
                     "messages": [
@@ -959,34 +1130,37 @@ async def generate_script_from_topic(req: GenerateScriptRequest):
                     "temperature": 0.7
                 }
             )
-            result = response.json()
-        
-        content = result.get("choices", [{}])[0].get("message", {}).get("content", "{}")
-        
-        # Parse JSON from response
-        import json
-        import re
-        
-        # Extract JSON from markdown code blocks if present
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-        if json_match:
-            content = json_match.group(1)
-        
-        storyboard = json.loads(content)
+            result = orjson.loads(response.content)
+            
+            content = result.get("choices", [{}])[0].get("message", {}).get("content", "{}")
+            
+            # Extract JSON from markdown code blocks if present
+            json_match = _JSON_BLOCK_RE.search(content)
+            if json_match:
+                content = json_match.group(1)
+            
+            storyboard = orjson.loads(content)
+            
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Failed to parse storyboard JSON: {e}")
+            return {
+                "success": False,
+                "error": "Failed to parse storyboard",
+                "raw_content": content[:500],
+                "cco": cco
+            }
+        except Exception as e:
+            logger.error(f"Script generation error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
         
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse storyboard JSON: {e}")
-        return {
-            "success": False,
-            "error": "Failed to parse storyboard",
-            "raw_content": content[:500],
-            "cco": cco
-        }
-    except Exception as e:
-        logger.error(f"Script generation error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            if embedding is None:
+                embedding = await get_qdrant_client().get_embedding(prompt)
+            await asyncio.to_thread(cache.put, cache_key, cache_scope, storyboard, embedding)
+        except Exception as e:
+            logger.warning(f"Script cache write failed: {e}")
     
-    # 4. Optionally create Sanity post (CREATE)
+    # 5. Optionally create Sanity post (CREATE)
     sanity_post = None
     if req.create_post and req.artist_id:
         try:
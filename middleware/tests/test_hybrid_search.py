@@ -57,6 +57,19 @@ class TestHybridSearchRRF:
         keywords = client._extract_keywords("")
         assert keywords == set()
     
+    def test_sparse_vector_matches_shared_keywords(self, client):
+        """Query and title sparse vectors share indices for common keywords."""
+        title_vec = client._sparse_vector("OpenAI Sora API 开放")
+        query_vec = client._sparse_vector("Sora API", is_query=True)
+        
+        assert set(query_vec.indices) <= set(title_vec.indices)
+        assert all(v == 1.0 for v in query_vec.values)
+    
+    def test_sparse_vector_empty(self, client):
+        """Stopword-only text yields an empty sparse vector."""
+        vec = client._sparse_vector("the is a", is_query=True)
+        assert vec.indices == []
+    
     # =========================================================================
     # RRF Fusion Tests
     # =========================================================================
@@ -129,6 +142,241 @@ class TestHybridSearchRRF:
         expected_score = vector_weight * (1.0 / (k + 1))  # rank=1
         assert abs(fused["t1"]["rrf_score"] - expected_score) < 0.0001
     
+    # =========================================================================
+    # Embedding Cache Tests
+    # =========================================================================
+    
+    @pytest.mark.asyncio
+    async def test_embedding_cache_hit(self, client):
+        """Repeated text is served from cache without a second fetch."""
+        calls = []
+        
+        async def fake_get_embeddings(texts):
+            calls.append(texts)
+            return [[0.1, 0.2]]
+        
+        client.get_embeddings = fake_get_embeddings
+        
+        first = await client.get_embedding("AI视频生成")
+        second = await client.get_embedding("AI视频生成")
+        
+        assert first == second == [0.1, 0.2]
+        assert len(calls) == 1
+        stats = client.get_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_embedding_cache_evicts_oldest(self, client):
+        """Cache stays within EMBEDDING_CACHE_SIZE, evicting LRU entries."""
+        client.EMBEDDING_CACHE_SIZE = 2
+        
+        async def fake_get_embeddings(texts):
+            return [[float(len(texts[0]))]]
+        
+        client.get_embeddings = fake_get_embeddings
+        
+        for text in ["a", "bb", "ccc"]:
+            await client.get_embedding(text)
+        
+        assert client.get_cache_stats()["size"] == 2
+    
+    # =========================================================================
+    # Upsert Buffer Tests
+    # =========================================================================
+
+    @pytest.mark.asyncio
+    async def test_upsert_buffer_flushes_full_batch(self, client):
+        """A full buffer is sent as a single wait=False upsert."""
+        upserts = []
+
+        class FakeQdrant:
+            async def upsert(self, collection_name, points, wait=True):
+                upserts.append((len(points), wait))
+
+        async def fake_get_embedding(text):
+            return [0.1, 0.2]
+
+        async def fake_ready_client():
+            return FakeQdrant()
+
+        client.UPSERT_BATCH_SIZE = 3
+        client.get_embedding = fake_get_embedding
+        client._ready_client = fake_ready_client
+
+        for i in range(4):
+            assert await client.upsert_topic(f"t{i}", f"Topic {i}", "")
+
+        assert upserts == [(3, False)]
+        assert await client.flush() == 1
+        assert upserts == [(3, False), (1, False)]
+        assert client._flush_task is None
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_points(self, client):
+        """A failed flush re-buffers its points and reports the error."""
+        class DownQdrant:
+            async def upsert(self, collection_name, points, wait=True):
+                raise ConnectionError("qdrant down")
+
+        async def fake_get_embedding(text):
+            return [0.1, 0.2]
+
+        async def fake_ready_client():
+            return DownQdrant()
+
+        client.get_embedding = fake_get_embedding
+        client._ready_client = fake_ready_client
+
+        assert await client.upsert_topic("t0", "Topic 0", "", wait=True) is False
+        assert len(client._pending) == 1
+        assert client._flush_task is not None  # Retry armed
+        with pytest.raises(ConnectionError):
+            await client.flush()
+        assert len(client._pending) == 1
+        client._flush_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_shutdown_closes_pools_when_flush_fails(self, client, monkeypatch):
+        """aclose() still closes the pooled clients if Qdrant is down."""
+        import lib.qdrant_client as qdrant_module
+        closed = []
+
+        async def failing_flush(wait=False):
+            raise ConnectionError("qdrant down")
+
+        async def fake_close_loop_clients():
+            closed.append(True)
+
+        client.flush = failing_flush
+        monkeypatch.setattr(qdrant_module, "close_loop_clients", fake_close_loop_clients)
+        monkeypatch.setattr(qdrant_module, "_client", client)
+
+        await qdrant_module.close_qdrant_client()
+        assert closed == [True]
+
+    @pytest.mark.asyncio
+    async def test_find_similar_sees_buffered_points(self, client):
+        """Buffered points are written with wait=True before a search."""
+        calls = []
+
+        class FakeQdrant:
+            async def upsert(self, collection_name, points, wait=True):
+                calls.append(("upsert", len(points), wait))
+
+            async def query_points(self, **kwargs):
+                calls.append(("query",))
+                return type("Response", (), {"points": []})()
+
+        async def fake_get_embedding(text):
+            return [0.1, 0.2]
+
+        async def fake_ready_client():
+            return FakeQdrant()
+
+        client.get_embedding = fake_get_embedding
+        client._ready_client = fake_ready_client
+        client._time_filter = lambda hours: None
+        client._search_params = lambda: None
+
+        assert await client.upsert_topic("t0", "Topic 0", "")
+        assert await client.find_similar("Topic 0", "") == []
+        assert calls == [("upsert", 1, True), ("query",)]
+        assert client._flush_task is None
+
+    @pytest.mark.asyncio
+    async def test_find_similar_batch_skips_empty_embeddings(self, client):
+        """One query batch covers the embedded items; the rest get []."""
+        from types import SimpleNamespace
+        batches = []
+
+        class FakeQdrant:
+            async def query_batch_points(self, collection_name, requests):
+                batches.append([r.query for r in requests])
+                return [
+                    SimpleNamespace(points=[SimpleNamespace(score=0.9, payload={"topic_id": f"t{i}"})])
+                    for i, _ in enumerate(requests)
+                ]
+
+        async def fake_get_embeddings(texts):
+            return [[0.1, 0.2] if text.startswith("good") else [] for text in texts]
+
+        async def fake_ready_client():
+            return FakeQdrant()
+
+        client.get_embeddings = fake_get_embeddings
+        client._ready_client = fake_ready_client
+        client._time_filter = lambda hours: None
+        client._search_params = lambda: None
+
+        results = await client.find_similar_batch([("good 1", ""), ("empty", ""), ("good 2", "")])
+        assert len(batches) == 1 and len(batches[0]) == 2
+        assert [[p["topic_id"] for p in r] for r in results] == [["t0"], [], ["t1"]]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_calls_create_collection_once(self, client, monkeypatch):
+        """Racing first calls create the collection and migrate v1 only once."""
+        import asyncio
+        from types import SimpleNamespace
+        calls = []
+
+        class FakeQdrant:
+            async def get_collections(self):
+                await asyncio.sleep(0)
+                return SimpleNamespace(collections=[SimpleNamespace(name=client.LEGACY_COLLECTION_NAME)])
+
+            async def create_collection(self, collection_name, **kwargs):
+                await asyncio.sleep(0)
+                calls.append("create")
+
+            async def create_payload_index(self, **kwargs):
+                calls.append("index")
+
+        async def fake_migrate():
+            calls.append("migrate")
+            return 0
+
+        fake = FakeQdrant()
+        monkeypatch.setattr(PerceptionQdrantClient, "client", property(lambda self: fake))
+        client.migrate_from_v1 = fake_migrate
+
+        await asyncio.gather(*(client._ensure_collection() for _ in range(5)))
+        assert calls == ["create", "index", "migrate"]
+
+    @pytest.mark.asyncio
+    async def test_migrate_from_v1(self, client):
+        """v1 points are copied to v2 with epoch created_at, page by page."""
+        from types import SimpleNamespace
+        from lib.qdrant_client import _point_id
+        upserts = []
+        pages = {
+            None: ([SimpleNamespace(
+                vector=[0.1, 0.2],
+                payload={"topic_id": "t1", "title": "Topic 1", "source_type": "rss_feed",
+                         "created_at": "2026-01-01T00:00:00"}
+            )], "next"),
+            "next": ([SimpleNamespace(vector=[0.3, 0.4], payload={"topic_id": "t2", "title": "Topic 2"}),
+                      SimpleNamespace(vector=None, payload={"topic_id": "t3"})], None)
+        }
+
+        class FakeQdrant:
+            async def scroll(self, collection_name, limit, offset, with_payload, with_vectors):
+                assert collection_name == client.LEGACY_COLLECTION_NAME
+                return pages[offset]
+
+            async def upsert(self, collection_name, points, wait=True):
+                upserts.extend(points)
+
+        async def fake_ready_client():
+            return FakeQdrant()
+
+        client._ready_client = fake_ready_client
+
+        assert await client.migrate_from_v1() == 2
+        assert upserts[0].id == _point_id("t1")
+        assert upserts[0].payload["created_at"] == 1767225600
+        assert upserts[1].payload["created_at"] == 0  # Unknown age stays out of time windows
+
     # =========================================================================
     # Singleton Test
     # =========================================================================
@@ -0,0 +1,60 @@
+"""Unit tests for the GPU lock manager (Lua acquire/release + scheduler)."""
+import pytest
+from unittest.mock import patch
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import lock_manager
+from lock_manager import GPULockManager, INFLIGHT_KEY
+
+
+class TestGPULockManager:
+    """Test token ownership and grant ordering."""
+
+    @pytest.fixture
+    def manager(self):
+        server = fakeredis.FakeServer()
+        with patch.object(
+            lock_manager.redis, "Redis",
+            lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+        ):
+            yield GPULockManager()
+
+    def test_release_only_by_owner(self, manager):
+        """Another task cannot release the token; the owner can."""
+        assert manager.acquire_lock(10, "owner") == 0
+        assert manager.release_lock("intruder") is False
+        assert manager.r.get(manager.GPU_TOKEN_KEY) == "owner"
+        assert manager.release_lock("owner") is True
+        assert not manager.r.exists(manager.GPU_TOKEN_KEY)
+
+    def test_queue_positions(self, manager):
+        """Queued tasks get their position in grant order; VIP goes first."""
+        assert manager.acquire_lock(10, "holder") == 0
+        assert manager.acquire_lock(10, "low-1") == 1
+        assert manager.acquire_lock(10, "low-2") == 2
+        assert manager.acquire_lock(100, "vip") == 1
+        assert manager.r.lrange(manager.QUEUE_HIGH, 0, -1) == ["vip"]
+
+    def test_new_arrival_does_not_jump_queue(self, manager):
+        """After a release, waiting tasks are granted before new arrivals."""
+        assert manager.acquire_lock(10, "holder") == 0
+        assert manager.acquire_lock(10, "low-1") == 1
+        assert manager.acquire_lock(100, "vip") == 1
+        manager.release_lock("holder")
+
+        # Token is free, but others are waiting: the newcomer queues too
+        assert manager.acquire_lock(10, "newcomer") == 3
+        assert not manager.r.exists(manager.GPU_TOKEN_KEY)
+
+        granted = []
+        manager.run_scheduler_loop(on_grant=granted.append, should_stop=lambda: bool(granted))
+        assert granted == ["vip"]
+        assert manager.r.get(manager.GPU_TOKEN_KEY) == "vip"
+        assert manager.r.llen(INFLIGHT_KEY) == 0
+
+        for expected in ("low-1", "newcomer"):
+            manager.release_lock(granted[-1])
+            granted.clear()
+            manager.run_scheduler_loop(on_grant=granted.append, should_stop=lambda: bool(granted))
+            assert granted == [expected]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ReportEngine templates
+================================
+Verifies compiled template rendering, the per-file template cache and
+concurrent CCO fetching.
+"""
+
+import os
+import pytest
+from lib.report_engine import ReportEngineWrapper, _compile_template
+
+
+class TestReportTemplates:
+    """Test suite for report template compilation and caching."""
+    
+    @pytest.fixture
+    def engine(self):
+        return ReportEngineWrapper()
+    
+    # =========================================================================
+    # Compiled Template Tests
+    # =========================================================================
+    
+    def test_compiled_matches_str_format(self):
+        """Compiled rendering matches str.format, including specs and escapes."""
+        template = "# {title}\n{{literal}} {ratio:.1%} {name!r:>8}"
+        fields = {"title": "标题", "ratio": 0.25, "name": "x"}
+        
+        assert _compile_template(template)(fields) == template.format(**fields)
+    
+    def test_compiled_falls_back_for_attribute_fields(self):
+        """Attribute fields fall back to str.format."""
+        template = "{title.upper}"
+        fields = {"title": "abc"}
+        
+        assert _compile_template(template)(fields) == template.format(**fields)
+    
+    # =========================================================================
+    # Template Cache Tests
+    # =========================================================================
+    
+    def test_template_file_read_once(self, engine, tmp_path, monkeypatch):
+        """An unchanged template file is compiled once and reused."""
+        path = tmp_path / "report.md"
+        path.write_text("# {title}", encoding="utf-8")
+        
+        first = engine._get_compiled_template(str(path))
+        
+        def fail_open(*args, **kwargs):
+            raise AssertionError("template re-read")
+        
+        monkeypatch.setattr("builtins.open", fail_open)
+        assert engine._get_compiled_template(str(path)) is first
+    
+    def test_template_reloaded_after_change(self, engine, tmp_path):
+        """A modified template (new mtime) is re-read."""
+        path = tmp_path / "report.md"
+        path.write_text("# {title}", encoding="utf-8")
+        assert engine._get_compiled_template(str(path))({"title": "a"}) == "# a"
+        
+        path.write_text("## {title}", encoding="utf-8")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        
+        assert engine._get_compiled_template(str(path))({"title": "a"}) == "## a"
+    
+    def test_missing_template_uses_default(self, engine, tmp_path):
+        """A missing template file renders the built-in default."""
+        render = engine._get_compiled_template(str(tmp_path / "missing.md"))
+        assert render is engine._get_compiled_template(str(tmp_path / "other.md"))
+    
+    # =========================================================================
+    # Concurrent Graph Fetch Tests
+    # =========================================================================
+    
+    def test_graph_fetch_uses_client_per_thread(self, engine, monkeypatch):
+        """Each fetch worker thread gets its own BettaFishClient."""
+        import sys
+        import threading
+        import types
+        owners = []
+        
+        class FakeBettaFishClient:
+            def __init__(self):
+                self.thread = threading.get_ident()
+                owners.append(self.thread)
+            
+            def get_topic_cco(self, topic_id, platform):
+                assert threading.get_ident() == self.thread
+                return {"title": topic_id}
+        
+        module = types.ModuleType("lib.bettafish_client")
+        module.BettaFishClient = FakeBettaFishClient
+        monkeypatch.setitem(sys.modules, "lib.bettafish_client", module)
+        monkeypatch.setattr(
+            engine, "build_graph_from_topic",
+            lambda topic_id, platform, cco=None, now=None: {"success": True, "title": cco["title"]}
+        )
+        
+        specs = [(f"t{i}", "xhs") for i in range(20)]
+        results = engine.build_graphs_from_topics(specs)
+        
+        assert [r["title"] for r in results] == [topic_id for topic_id, _ in specs]
+        assert len(owners) == len(set(owners))  # No client shared across threads
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ScriptCache
+=====================
+Verifies exact and semantic storyboard lookups.
+"""
+
+import pytest
+from lib.script_cache import ScriptCache
+
+
+class TestScriptCache:
+    """Test suite for the generate_script storyboard cache."""
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = ScriptCache(str(tmp_path / "script_cache.db"))
+        yield cache
+        cache.close()
+    
+    def test_exact_hit(self, cache):
+        """A stored storyboard is returned for the same request key."""
+        key = cache.make_key("t1", "xhs", "tech_blogger", "informative")
+        cache.put(key, "xhs|tech_blogger|informative", {"title": "标题", "scenes": []})
+        
+        assert cache.get(key) == {"title": "标题", "scenes": []}
+        assert cache.get(cache.make_key("t1", "xhs", "tech_blogger", "dramatic")) is None
+    
+    def test_expired_entry_ignored(self, cache):
+        """Rows older than the TTL are neither returned nor kept by prune()."""
+        key = cache.make_key("t1", "xhs", "tech_blogger", "informative")
+        cache.put(key, "scope", {"title": "old"})
+        cache.TTL_SECONDS = -1
+        
+        assert cache.get(key) is None
+        assert cache.prune() == 1
+    
+    def test_semantic_hit_within_scope(self, cache):
+        """A near-identical prompt embedding hits; other scopes never do."""
+        cache.put("k1", "xhs|a|b", {"title": "near"}, [1.0, 0.0, 0.0])
+        cache.put("k2", "xhs|a|b", {"title": "far"}, [0.0, 1.0, 0.0])
+        
+        assert cache.find_similar("xhs|a|b", [0.99, 0.05, 0.0]) == {"title": "near"}
+        assert cache.find_similar("xhs|a|b", [0.7, 0.7, 0.0]) is None
+        assert cache.find_similar("dy|a|b", [1.0, 0.0, 0.0]) is None
+
+    def test_semantic_lookup_never_crosses_topics(self, cache):
+        """Two topics with near-identical prompts keep separate storyboards."""
+        scope_t1 = cache.make_scope("t1", "xhs", "tech_blogger", "informative")
+        scope_t2 = cache.make_scope("t2", "xhs", "tech_blogger", "informative")
+        cache.put("k1", scope_t1, {"title": "topic 1"}, [1.0, 0.0, 0.0])
+
+        assert cache.find_similar(scope_t2, [1.0, 0.0, 0.0]) is None
+        assert cache.find_similar(scope_t1, [0.99, 0.05, 0.0]) == {"title": "topic 1"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
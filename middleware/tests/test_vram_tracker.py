@@ -39,6 +39,10 @@ class TestVRAMTracker:
 
             yield mock
 
+            # Drop the process-wide NVML state created against this mock
+            from lib.vram_tracker import _nvml_shutdown
+            _nvml_shutdown()
+
     def test_get_status_returns_valid_data(self, mock_pynvml):
         """Test that get_status returns correct VRAM info."""
         from lib.vram_tracker import VRAMTracker
@@ -90,3 +94,105 @@ class TestVRAMTracker:
         # With 20GB free and 2GB margin, can fit 18GB
         assert tracker.can_fit(18000, safety_margin_mb=2048) is True
         assert tracker.can_fit(18500, safety_margin_mb=2048) is False
+
+    def test_nvml_initialized_once_per_process(self, mock_pynvml):
+        """Trackers share one nvmlInit; plain shutdown() keeps NVML alive."""
+        from lib.vram_tracker import VRAMTracker
+
+        first = VRAMTracker()
+        first.get_status()
+        first.shutdown()
+        VRAMTracker().get_status()
+
+        mock_pynvml.nvmlInit.assert_called_once()
+        mock_pynvml.nvmlShutdown.assert_not_called()
+
+        first.shutdown(force=True)
+        mock_pynvml.nvmlShutdown.assert_called_once()
+
+    def test_get_status_reuses_recent_sample(self, mock_pynvml):
+        """Calls within the poll TTL share one NVML sample."""
+        from lib.vram_tracker import VRAMTracker
+
+        tracker = VRAMTracker()
+        first = tracker.get_status()
+        assert tracker.get_status() is first
+        assert mock_pynvml.nvmlDeviceGetComputeRunningProcesses.call_count == 1
+
+        tracker._cache_ts -= tracker._ttl
+        assert tracker.get_status() is not first
+
+    def test_can_fit_skips_process_enumeration(self, mock_pynvml):
+        """can_fit only reads memory info, never the process list."""
+        from lib.vram_tracker import VRAMTracker
+
+        tracker = VRAMTracker()
+
+        assert tracker.get_memory() == (24576, 4096, 20480)
+        assert tracker.can_fit(18000) is True
+        mock_pynvml.nvmlDeviceGetComputeRunningProcesses.assert_not_called()
+
+    def test_process_name_read_from_proc(self, mock_pynvml):
+        """In the host PID namespace, PIDs are named from /proc/<pid>/comm."""
+        import os
+        from lib.vram_tracker import VRAMTracker
+
+        mock_pynvml.nvmlDeviceGetComputeRunningProcesses.return_value[0].pid = os.getpid()
+        with open("/proc/self/comm") as f:
+            expected = f.read().strip()
+
+        with patch('lib.vram_tracker._PROC_NAMES', True):
+            status = VRAMTracker().get_status()
+
+        assert status.processes[0].name == expected
+        mock_pynvml.nvmlSystemGetProcessName.assert_not_called()
+
+    def test_process_name_from_nvml_in_container(self, mock_pynvml):
+        """In another PID namespace, /proc/<host pid> is never trusted."""
+        import os
+        from lib.vram_tracker import VRAMTracker
+
+        mock_pynvml.nvmlDeviceGetComputeRunningProcesses.return_value[0].pid = os.getpid()
+
+        with patch('lib.vram_tracker._PROC_NAMES', False):
+            status = VRAMTracker().get_status()
+
+        assert status.processes[0].name == "/usr/bin/python3"
+
+    def test_can_fit_uses_given_snapshot(self, mock_pynvml):
+        """An injected status is used as-is, without another NVML read."""
+        from lib.vram_tracker import VRAMTracker, VRAMStatus
+
+        tracker = VRAMTracker()
+        snapshot = VRAMStatus(total_mb=24576, used_mb=20576, free_mb=4000, processes=[])
+
+        assert tracker.can_fit(2000, status=snapshot) is True
+        assert tracker.can_fit(3500, status=snapshot) is False
+        mock_pynvml.nvmlDeviceGetMemoryInfo.assert_not_called()
+
+    def test_get_process_by_name_shares_snapshot(self, mock_pynvml):
+        """Lookups are case-insensitive and reuse the cached sample."""
+        from lib.vram_tracker import VRAMTracker
+
+        mock_pynvml.nvmlDeviceGetComputeRunningProcesses.return_value[0].pid = 999999999
+        tracker = VRAMTracker()
+
+        assert tracker.get_process_by_name("PYTHON").pid == 999999999
+        assert tracker.get_process_by_name("comfyui") is None
+        assert mock_pynvml.nvmlDeviceGetComputeRunningProcesses.call_count == 1
+
+    def test_can_fit_decides_clear_cases_from_cache(self, mock_pynvml):
+        """A recent sample answers clear-cut checks; borderline ones re-poll."""
+        from lib.vram_tracker import VRAMTracker
+
+        tracker = VRAMTracker()
+        tracker.get_status()  # free=20480 MB
+        tracker._cache_ts -= tracker._ttl  # Past the poll TTL, within the band age
+        mock_pynvml.nvmlDeviceGetMemoryInfo.reset_mock()
+
+        assert tracker.can_fit(4000) is True
+        assert tracker.can_fit(22000) is False
+        mock_pynvml.nvmlDeviceGetMemoryInfo.assert_not_called()
+
+        assert tracker.can_fit(19000) is True
+        mock_pynvml.nvmlDeviceGetMemoryInfo.assert_called_once()
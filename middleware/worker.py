@@ -313,7 +313,25 @@ async def process_broll_generation(task_id, params):
     return result
 
 
+# Tasks left in our processing list by a previous crash of this worker
+try:
+    redis_client.requeue_stale_tasks(worker_id=redis_client.WORKER_ID)
+except Exception as e:
+    logger.error(f"Failed to recover orphaned tasks: {e}")
+redis_client.start_heartbeat()
+
+REAP_INTERVAL = 60  # seconds between stale-task sweeps
+last_reap = 0.0
+
 while True:
+    # 0. Return tasks orphaned by crashed workers
+    if time.monotonic() - last_reap > REAP_INTERVAL:
+        last_reap = time.monotonic()
+        try:
+            redis_client.requeue_stale_tasks()
+        except Exception as e:
+            logger.error(f"Stale task sweep failed: {e}")
+
     # 1. Fetch Task (Blocking Wait)
     try:
         task_id = redis_client.get_next_task(timeout=5)
@@ -422,4 +440,9 @@ while True:
         logger.error(f"❌ Error processing {task_id}: {e}")
         traceback.print_exc()
         redis_client.update_status(task_id, "failed", error=str(e))
-
+    finally:
+        # Done either way; remove from our processing list
+        try:
+            redis_client.ack_task(task_id)
+        except Exception as e:
+            logger.error(f"Failed to ack task {task_id}: {e}")
@@ -0,0 +1,75 @@
+import { renderMedia, selectComposition } from '@remotion/renderer';
+import { bundle } from '@remotion/bundler';
+import path from 'path';
+import fs from 'fs';
+import readline from 'readline';
+
+// Long-lived render worker for middleware/lib/remotion_driver.py.
+// Protocol: one JSON job per stdin line {"timelinePath", "outputPath"};
+// one result line per job on stdout, prefixed with RESULT_PREFIX.
+// Everything else on stdout/stderr is log output.
+// The bundle is built once and reused, so restart the daemon after editing src/.
+const RESULT_PREFIX = '@@RESULT ';
+
+let bundled: Promise<string> | null = null;
+const getBundle = () => {
+    if (!bundled) {
+        console.log('📦 Bundling (once per daemon)...');
+        bundled = bundle(path.join(__dirname, 'src/index.tsx'));
+        bundled.catch(() => { bundled = null; }); // Retry on next job
+    }
+    return bundled;
+};
+
+const render = async (timelinePath: string, outputPath: string) => {
+    console.log('📦 Reading Timeline:', timelinePath);
+    const timeline = JSON.parse(fs.readFileSync(timelinePath, 'utf-8'));
+    const serveUrl = await getBundle();
+
+    const composition = await selectComposition({
+        serveUrl,
+        id: 'MainVideo',
+        inputProps: { timeline },
+    });
+
+    console.log('🚀 Rendering (CPU Mode - Concurrency 1)...');
+    await renderMedia({
+        composition,
+        serveUrl,
+        codec: 'h264',
+        outputLocation: outputPath,
+        inputProps: { timeline },
+        // 🛡️ SAFETY: Force CPU rendering to protect 4090 VRAM
+        chromiumOptions: {
+            gl: 'angle',
+        },
+        concurrency: 1, // 🛡️ SAFETY: Prevent CPU starvation of other services
+        verbose: true,
+    });
+
+    console.log(`✅ Render done: ${outputPath}`);
+};
+
+const main = async () => {
+    const lines = readline.createInterface({ input: process.stdin });
+    console.log(`${RESULT_PREFIX}${JSON.stringify({ ready: true })}`);
+
+    // Jobs are handled strictly one at a time (for await serialises them)
+    for await (const line of lines) {
+        if (!line.trim()) continue;
+        const started = Date.now();
+        try {
+            const { timelinePath, outputPath } = JSON.parse(line);
+            await render(timelinePath, outputPath);
+            console.log(`${RESULT_PREFIX}${JSON.stringify({ ok: true, duration_ms: Date.now() - started })}`);
+        } catch (err) {
+            console.error('❌ Render Failed:', err);
+            console.log(`${RESULT_PREFIX}${JSON.stringify({ ok: false, error: String(err), duration_ms: Date.now() - started })}`);
+        }
+    }
+};
+
+main().catch((err) => {
+    console.error('❌ Render daemon crashed:', err);
+    process.exit(1);
+});